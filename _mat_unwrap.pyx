@@ -0,0 +1,39 @@
+# cython: language_level=3
+"""
+Compiled version of the .mat signal walk in extraction.py (_signal_fields_from_mat_struct).
+Build it in place, next to extraction.py, with:
+
+    cythonize -i _mat_unwrap.pyx
+
+extraction.py imports it when the extension has been built and uses the pure-Python walk otherwise,
+so both must keep returning the same thing.
+"""
+import numpy as np
+from scipy.io.matlab import mat_struct
+
+
+cpdef object unwrap_signal(dict mat_data):
+    """
+    Returns (values, start_value, increment, number_of_values) from a .mat file loaded with
+    squeeze_me=True and struct_as_record=False, or None if it doesn't have the expected Signal layout.
+    """
+    cdef object signal, x_values, values
+    cdef double start_value, increment
+    cdef Py_ssize_t number_of_values
+
+    signal = mat_data['Signal'] if 'Signal' in mat_data else mat_data.get('signal')
+    if not isinstance(signal, mat_struct):
+        return None
+    try:
+        x_values = signal.x_values
+        values = np.ascontiguousarray(signal.y_values.values)
+        # Typed locals: the scalar fields are converted once, straight to C doubles/integers
+        start_value = x_values.start_value
+        increment = x_values.increment
+        number_of_values = int(x_values.number_of_values)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    # squeeze_me also drops the channel axis of single-channel signals; restore (N, 1) like the record path
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    return values, start_value, increment, number_of_values
@@ -1,12 +1,82 @@
 import os
 import scipy.io as sio
-from nptdms import TdmsFile # Import for TDMS file handling
+try:
+    from nptdms import TdmsFile # Import for TDMS file handling
+    _NPTDMS_AVAILABLE = True
+except ImportError: # .mat files can still be extracted without it
+    TdmsFile = None
+    _NPTDMS_AVAILABLE = False
 import numpy as np
+import h5py # HDF5 output and .mat sidecars
 import re # To parse filenames
+from operator import itemgetter # Field access for the fixed .mat struct layout
 import sys
-# import traceback # Uncomment for detailed error traces if needed
+import logging
+import io
+import contextlib
+import functools
+import mmap # Memory-mapped reads of .mat files
+from dataclasses import dataclass, field # TimeAxis, ExtractionResult
+import multiprocessing # Parallel per-file extraction
+import json # Metadata of each file is also stored as one JSON attribute
+import zlib # Sensor chunks are compressed in the workers, see _precompress_sensor_values
+
+# Module logger. Extraction and saving steps are DEBUG, per-file results INFO and problems WARNING/ERROR,
+# so at the default INFO level a successful file only logs its result summary (to EXTRACTION_LOG_PATH, see the driver).
+# Run with --debug (or configure logging at DEBUG level) to see every step, or --quiet for problems only.
+logger = logging.getLogger(__name__)
+
+# Filename pattern for the data files, compiled once at import instead of on every parse_filename call:
+# ^(\d+Nm)       - Group 1: Load (digits followed by Nm)
+# _([^_.]+)      - Group 2: Condition (one or more characters that are NOT an underscore or a dot)
+# (_)?           - Optional Group 3: An underscore (makes the severity part optional)
+# (\w*)          - Group 4: Severity (zero or more word characters, before the extension)
+# \.(mat|tdms)\Z - Match dot followed by extension (mat or tdms) and the very end of the string (Group 5 is extension)
+_FILENAME_RE = re.compile(r'^(\d+Nm)_([^_.]+)(_)?(\w*)\.(mat|tdms)\Z', re.IGNORECASE)
+
+# Dataset folder name (lowercase) -> sensor type hint, checked in this order by parse_filename
+_SENSOR_TYPE_FOLDERS = {
+    'acoustic': 'Acoustic',
+    'vibration': 'Vibration',
+    'current,temp': 'Temp_Current',
+}
+
+# --- Helper Functions to Parse Filename and Extract Metadata ---
+# The filename fields only depend on the name itself, and the same names repeat in every sensor folder
+# (e.g. acoustic/0Nm_BPFI_03.mat and vibration/0Nm_BPFI_03.mat), so they are cached on the filename alone.
+@functools.lru_cache(maxsize=100_000)
+def _parse_name_fields(filename):
+    """
+    Splits a data filename into (load, condition, severity, extension), with 'No_Severity' for a missing
+    severity and the extension lowercased. Returns None if the name doesn't match the expected pattern.
+    """
+    # Fast path: the usual load_condition[_severity].ext shape is split with plain string methods.
+    # It only accepts names the regex would accept with the same groups; anything else falls through to the regex.
+    fields = None # (load, condition, severity_match, extension)
+    name, _, ext = filename.rpartition('.')
+    if ext.lower() in ('mat', 'tdms') and '.' not in name:
+        parts = name.split('_', 2) # e.g., ['0Nm', 'BPFI', '03'] or ['0Nm', 'Normal']
+        load_part = parts[0]
+        severity_part = parts[2] if len(parts) == 3 else ''
+        if (len(parts) >= 2 and parts[1] and
+            load_part[-2:].lower() == 'nm' and load_part[:-2].isdecimal() and # \d+Nm
+            (not severity_part or severity_part.replace('_', '').isalnum())): # \w*
+             fields = (load_part, parts[1], severity_part, ext)
+
+    if fields is None:
+        # Regex based on observed file names (see _FILENAME_RE at the top for the group layout)
+        match = _FILENAME_RE.match(filename)
+        if match:
+            # The severity is in group 4 because group 3 was the optional underscore
+            fields = (match.group(1), match.group(2), match.group(4), match.group(5)) # Extension is group 5
+        else:
+            return None
+
+    load, condition, severity_match, file_extension = fields # e.g., '0Nm', 'BPFI', '03' (or '' for Normal), 'mat'
+    # If severity_match is empty, set severity to None or a placeholder
+    severity = severity_match if severity_match else 'No_Severity' # Assign a placeholder like 'No_Severity' if missing
+    return load, condition, severity, file_extension.lower()
 
-# --- Helper Function to Parse Filename and Extract Metadata ---
 def parse_filename(filename, filepath):
     """
     Parses the filename to extract load, condition, severity, and sensor type hint.
@@ -17,120 +87,249 @@ def parse_filename(filename, filepath):
     # if filename.endswith(':Zone.Identifier'):
     #     return None
 
-    # Corrected regex based on observed file names:
-    # ^(\d+Nm)       - Group 1: Load (digits followed by Nm)
-    # _([^_]+)       - Group 2: Condition (one or more characters that are NOT an underscore)
-    # (_)?           - Optional Group 3: An underscore (makes the severity part optional)
-    # ([^.]*)        - Group 4: Severity (zero or more characters that are NOT a dot, before the extension)
-    # \.(mat|tdms)$  - Match dot followed by extension (mat or tdms) and end of string (Group 5 is extension)
-    match = re.match(r'^(\d+Nm)_([^_]+)(_)?([^.]*)\.(mat|tdms)$', filename, re.IGNORECASE)
-    if match:
-        load = match.group(1)      # e.g., '0Nm'
-        condition = match.group(2) # e.g., 'BPFI', 'Normal', 'Unbalance'
-        # The severity is in group 4 because group 3 was the optional underscore
-        severity_match = match.group(4) # e.g., '03', '10', '0583mg', '' (for Normal)
-        # If severity_match is empty, set severity to None or a placeholder
-        severity = severity_match if severity_match else 'No_Severity' # Assign a placeholder like 'No_Severity' if missing
-
-
-        file_extension = match.group(5).lower() # Extension is now group 5
-
-        sensor_type = None
-        # Infer sensor type based on the directory path (most reliable for this dataset structure)
-        filepath_lower = filepath.lower()
-        # Use os.sep to make path check work correctly on different OS
-        if os.sep + 'acoustic' + os.sep in filepath_lower: # Check for the specific folder name
-             sensor_type = 'Acoustic'
-        elif os.sep + 'vibration' + os.sep in filepath_lower: # Check for the specific folder name
-             sensor_type = 'Vibration'
-        elif os.sep + 'current,temp' + os.sep in filepath_lower: # Check for the specific folder name
-             sensor_type = 'Temp_Current'
-        # Fallback if the file is not in one of these standard folders (less likely for this dataset)
-        elif file_extension == 'mat':
-             sensor_type = 'Mat_Unknown_Path'
-        elif file_extension == 'tdms':
-             sensor_type = 'TDMS_Unknown_Path'
-
-
-        return {
-            'filename': filename,
-            'load': load,
-            'condition': condition,
-            'severity': severity,
-            'extension': file_extension,
-            'sensor_type': sensor_type, # This is the initial hint based on path/name
-            'filepath': filepath       # Full path for debugging/access (absolute path)
-            # 'relative_filepath': os.path.relpath(filepath, BASE_DATASET_DIRECTORY) # Optional: add relative path to metadata
-        }
-    else:
+    fields = _parse_name_fields(filename) # Cached, see above
+    if fields is None:
         # This line will print filenames that didn't match the expected data file pattern
         # print(f"Skipping: Filename format not recognized: {filename}") # Optional: uncomment for debugging
         return None
+    load, condition, severity, file_extension = fields
+
+    # Infer sensor type based on the directory path (most reliable for this dataset structure)
+    # Split on os.sep once (folders only, not the filename) and look the folder names up in the known sensor folders
+    folder_names = {part.lower() for part in filepath.split(os.sep)[:-1]}
+    sensor_type = next((t for folder, t in _SENSOR_TYPE_FOLDERS.items() if folder in folder_names), None)
+    # Fallback if the file is not in one of these standard folders (less likely for this dataset)
+    if sensor_type is None:
+         if file_extension == 'mat':
+              sensor_type = 'Mat_Unknown_Path'
+         elif file_extension == 'tdms':
+              sensor_type = 'TDMS_Unknown_Path'
+
+    # A new dictionary every call: callers own (and may modify) their metadata
+    return {
+        'filename': filename,
+        'load': load,
+        'condition': condition,
+        'severity': severity,
+        'extension': file_extension,
+        'sensor_type': sensor_type, # This is the initial hint based on path/name
+        'filepath': filepath       # Full path for debugging/access (absolute path)
+        # 'relative_filepath': os.path.relpath(filepath, BASE_DATASET_DIRECTORY) # Optional: add relative path to metadata
+    }
 
-# --- Helper Function to print the structure of a MATLAB object/struct ---
-# (This function is kept for debugging/inspection, uncomment calls as needed)
-# Keep this function UNCOMMENTED if you need to use print_mat_structure for debugging other MAT files
-def print_mat_structure(obj, indent=0, name="mat_object"):
-    """Recursively prints the structure of a MATLAB object loaded by scipy.io.loadmat."""
-    prefix = "  " * indent
-
-    # Check if it's a MATLAB struct - more robust check
-    if isinstance(obj, sio.matlab.mio5_params.mat_struct) and hasattr(obj, '_fieldnames'):
-        print(f"{prefix}Struct '{name}':")
-        if not obj._fieldnames:
-            print(f"{prefix}  (No fields)")
-        else:
-            for field_name in obj._fieldnames:
-                try:
-                    print_mat_structure(obj[field_name], indent + 1, field_name)
-                except Exception as e:
-                    print(f"{prefix}  Error accessing field '{field_name}': {e}")
+# --- Cached MAT Loader ---
+# loadmat is the dominant cost of extract_data_from_mat, so results are kept for files that are read again
+# (re-runs in the same session, debugging). The file's modification time is part of the key so an edited file
+# is reloaded instead of served stale. Kept small since a single MAT file can be tens of MB;
+# long-running callers can free it with _load_mat_cached.cache_clear(). The pool driver extracts every file once per
+# run (re-runs are served by the sidecars), so process_one clears it after each file instead of keeping decoded files
+# alive in every worker.
+# Only the signal variable is decoded. The file is read through a read-only memory map, so the OS pages in just
+# the parts scipy touches: other variables are skipped by seeking past them and never leave the disk.
+_MAT_SIGNAL_VARIABLES = ('Signal', 'signal')
+
+@functools.lru_cache(maxsize=32)
+def _load_mat_cached(filepath, mtime, squeeze_me=False, struct_as_record=True):
+    """Loads the signal variable of a .mat file with scipy.io.loadmat. Cached per (filepath, mtime, load options)."""
+    with open(filepath, 'rb') as mat_file, mmap.mmap(mat_file.fileno(), 0, access=mmap.ACCESS_READ) as mat_stream:
+        # mat_dtype keeps the MATLAB class of the stored arrays (e.g. double) when scipy squeezes them
+        return sio.loadmat(mat_stream, variable_names=_MAT_SIGNAL_VARIABLES,
+                           squeeze_me=squeeze_me, struct_as_record=struct_as_record, mat_dtype=squeeze_me)
+
+
+# --- Helper to Unwrap the Fixed .mat Struct Layout ---
+# The signal structs in this dataset always have the same layout, so their fields are fetched with
+# precomputed itemgetters instead of checking every level of nesting by hand.
+_X_VALUES_FIELDS = itemgetter('start_value', 'increment', 'number_of_values')
+_Y_VALUES_FIELDS = itemgetter('values')
+
+def _unwrap_struct(container, fields):
+    """
+    Returns the fields of a 1x1 MATLAB struct (as loaded by scipy.io.loadmat with struct_as_record=True).
+    fields is an itemgetter, so several fields come back as a tuple in one call.
+    Raises ValueError/TypeError/AttributeError if the container doesn't have that layout.
+    """
+    if container.size != 1:
+        raise ValueError(f"expected a 1x1 struct, found shape {container.shape}")
+    return fields(container.reshape(-1)[0])
 
-    elif isinstance(obj, np.ndarray):
-        print(f"{prefix}NumPy Array '{name}': shape={obj.shape}, dtype={obj.dtype}")
-        if obj.dtype.hasobject:
-            # print(f"{prefix}  Contains Objects. Exploring first few elements:") # Keep output shorter
-            elements_to_show = []
-            try:
-                if obj.size > 0:
-                    # Try accessing first few elements robustly
-                    flat_obj = obj.flatten()
-                    elements_to_show = [flat_obj[i] for i in range(min(1, flat_obj.size))] # Only show 1 element for brevity
-            except Exception as e:
-                # print(f"{prefix}    Could not access elements to show: {e}") # Too noisy maybe?
-                elements_to_show = []
-
-            for i, elem in enumerate(elements_to_show):
-                print(f"{prefix}  Element [{i}] type: {type(elem)}")
-                # Recursively print structure for complex types, value for simple ones
-                if isinstance(elem, (sio.matlab.mio5_params.mat_struct, np.ndarray, list, tuple, dict, np.void)): # Added np.void
-                     print_mat_structure(elem, indent + 2, f"element_[{i}]_content")
-                else: # Print value representation
-                     value_repr = repr(elem)
-                     if len(value_repr) > 100: value_repr = value_repr[:97] + "..."
-                     print(f"{prefix}  Element [{i}] value: {value_repr}")
-             # If obj.size > len(elements_to_show): print(f"{prefix}  ...") # Keep output shorter
-             # if obj.size == 0: print(f"{prefix}  (Empty object array)") # Keep output shorter
-
-    elif isinstance(obj, np.void): # Handle numpy.void (structured array element) directly
-         print(f"{prefix}NumPy Void (Struct Record) '{name}': dtype={obj.dtype}")
-         if obj.dtype.names:
-             for field_name in obj.dtype.names:
-                 try:
-                     # Access element by field name. Result might be a scalar or array
-                     field_value = obj[field_name]
-                     print_mat_structure(field_value, indent + 1, field_name)
-                 except Exception as e:
-                     print(f"{prefix}  Error accessing field '{field_name}': {e}")
-         else:
-              print(f"{prefix}  (No fields)")
 
+# --- Helper to Read the Signal Through scipy's mat_struct Objects ---
+def _signal_fields_from_mat_struct(mat_data):
+    """
+    Returns (values, start_value, increment, number_of_values) from a .mat file loaded with
+    squeeze_me=True and struct_as_record=False, where scipy has already unwrapped the 1x1 struct levels.
+    Returns None if the file doesn't have the expected Signal layout; the caller then falls back to the record path.
+    """
+    signal = mat_data['Signal'] if 'Signal' in mat_data else mat_data.get('signal')
+    if not isinstance(signal, sio.matlab.mat_struct):
+        return None
+    try:
+        x_values, y_values = signal.x_values, signal.y_values
+        values = np.ascontiguousarray(y_values.values)
+        start_value = float(x_values.start_value)
+        increment = float(x_values.increment)
+        number_of_values = int(x_values.number_of_values)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    # squeeze_me also drops the channel axis of single-channel signals; restore (N, 1) like the record path
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    return values, start_value, increment, number_of_values
+
+
+# Optional compiled version of the walk above (see _mat_unwrap.pyx, build with `cythonize -i _mat_unwrap.pyx`).
+# Without the built extension the pure-Python function is used; both return the same tuple.
+try:
+    from _mat_unwrap import unwrap_signal as _read_signal_fields
+except ImportError:
+    _read_signal_fields = _signal_fields_from_mat_struct
 
-    else:
-        # Print basic types and their values
-        value_repr = repr(obj)
-        if len(value_repr) > 100: value_repr = value_repr[:97] + "..."
-        print(f"{prefix}Basic Type '{name}': type={type(obj)}, value={value_repr}")
+
+# --- HDF5 Sidecars for .mat Files ---
+# Parsing MATLAB's nested struct format is slow compared to reading a plain HDF5 dataset, so the first
+# successful extraction of a .mat file writes the raw signal next to it as '<file>.mat.h5'. Later runs read
+# the sidecar instead, as long as it is newer than the .mat file. Set USE_MAT_H5_SIDECARS = False to disable.
+_MAT_SIDECAR_SUFFIX = '.h5'
+
+def _mat_sidecar_path(filepath):
+    """Returns the path of the HDF5 sidecar for a .mat file."""
+    return filepath + _MAT_SIDECAR_SUFFIX
+
+def _read_mat_sidecar(filepath):
+    """
+    Reads the raw signal of a .mat file from its HDF5 sidecar.
+    Returns (values, start_value, increment, number_of_values), or None if there is no up-to-date sidecar.
+    Time parameters that were not found in the original file are None.
+    """
+    if not USE_MAT_H5_SIDECARS:
+        return None
+    sidecar_path = _mat_sidecar_path(filepath)
+    try:
+        if not os.path.exists(sidecar_path) or os.path.getmtime(sidecar_path) < os.path.getmtime(filepath):
+            return None
+        with h5py.File(sidecar_path, 'r') as sidecar:
+            values = sidecar['values'][:]
+            start_value = sidecar.attrs.get('start_value')
+            increment = sidecar.attrs.get('increment')
+            number_of_values = sidecar.attrs.get('number_of_values')
+        return (values,
+                float(start_value) if start_value is not None else None,
+                float(increment) if increment is not None else None,
+                int(number_of_values) if number_of_values is not None else None)
+    except Exception as e:
+        logger.warning("  Warning: Could not read HDF5 sidecar %s: %s. Reading the .mat file instead.", sidecar_path, e)
+        return None
+
+def _write_mat_sidecar(filepath, values, start_value, increment, number_of_values):
+    """Writes the raw signal of a .mat file to its HDF5 sidecar. Failures only print a warning."""
+    if not USE_MAT_H5_SIDECARS:
+        return
+    sidecar_path = _mat_sidecar_path(filepath)
+    try:
+        with h5py.File(sidecar_path, 'w', **_HDF5_WRITE_CACHE) as sidecar:
+            # Same fast shuffle+LZF layout as the output signals: sidecars are decompressed on every later run
+            if values.size > 0 and values.dtype.kind in 'fiub':
+                sidecar.create_dataset('values', data=values, **_signal_dataset_options(values.shape))
+            else:
+                sidecar.create_dataset('values', data=values)
+            for key, value in (('start_value', start_value), ('increment', increment), ('number_of_values', number_of_values)):
+                if value is not None:
+                    sidecar.attrs[key] = value
+    except Exception as e:
+        logger.warning("  Warning: Could not write HDF5 sidecar %s: %s", sidecar_path, e)
+        # Don't leave a partial sidecar behind that a later run would pick up
+        try: os.remove(sidecar_path)
+        except OSError: pass
+
+
+# --- Lazy Time Axis for Uniformly Sampled Signals ---
+# A .mat signal's time vector is fully described by its start, increment and length, so it is kept in
+# that form instead of as an N-element float64 array. Single indices and slices are computed on demand;
+# code that hands it to numpy (np.asarray, np.diff, h5py) gets the full array built through __array__.
+@dataclass(frozen=True)
+class TimeAxis:
+    """Timestamps start + i * inc for i in range(n), materialized only when needed."""
+    start: float
+    inc: float
+    n: int
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def shape(self):
+        return (self.n,)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            # Only the requested chunk is built
+            return self.start + np.arange(*idx.indices(self.n)) * self.inc
+        idx = int(idx)
+        if idx < 0:
+            idx += self.n
+        if not 0 <= idx < self.n:
+            raise IndexError(f"TimeAxis index out of range (length {self.n})")
+        return self.start + idx * self.inc
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError("TimeAxis has no stored array; a new one has to be built")
+        stop = self.start + (self.n - 1) * self.inc
+        return np.linspace(self.start, stop, self.n, dtype=dtype or np.float64)
+
+    def storage_dtype(self):
+        """
+        float32 if it resolves every timestamp of this axis to within 1% of a sample step, float64 otherwise.
+        float32 covers the usual seconds-long recordings at half the size; long recordings need float64.
+        """
+        if self.n == 0 or self.inc == 0:
+            return np.dtype(np.float64)
+        largest = max(abs(self.start), abs(self.start + (self.n - 1) * self.inc))
+        if largest * np.finfo(np.float32).eps <= 0.01 * abs(self.inc):
+            return np.dtype(np.float32)
+        return np.dtype(np.float64)
+
+
+# --- Result of Extracting One File ---
+# Both extractors return one of these, also when extraction failed (extraction_error is set then).
+# It has a fixed set of fields, so slots keep it small and attribute access cheap when many files are held in memory.
+@dataclass(slots=True)
+class ExtractionResult:
+    """Extracted signals, time information and properties of one .mat or .tdms file."""
+    metadata: dict                                         # parse_filename() dictionary including filepath
+    sensor_values: dict = field(default_factory=dict)      # {descriptive_name: np.array}; arrays covered by compressed_chunks
+                                                           # come back from the worker as _PrecompressedSensor
+    timestamps: object = None                              # TimeAxis (or numpy array) of timestamps
+    sample_rate: float | None = None
+    inferred_sensor_type: str = ''
+    sensor_names: list = field(default_factory=list)       # Names of the sensors with non-empty data
+    num_samples: int | None = None                         # Number of samples of the first non-empty sensor (set by process_one)
+    raw_channel_names: list = field(default_factory=list)  # TDMS only: raw DAQ names of channels with non-empty data
+    channel_properties: dict = field(default_factory=dict) # TDMS only: {descriptive_name: {property_key: value}}
+    all_channel_properties_raw: dict = field(default_factory=dict) # TDMS only: {raw_channel_name: {property_key: value}}
+    channel_read_errors: dict = field(default_factory=dict) # TDMS only: {raw_channel_name: error message}
+    sensor_scaling: dict = field(default_factory=dict)     # TDMS only: {descriptive_name: (slope, intercept)} for sensors
+                                                           # kept as raw integers; value = raw * slope + intercept
+    compressed_chunks: dict = field(default_factory=dict)  # {sensor name or _SENSOR_MATRIX: [bytes, ...]} shuffled+deflated chunks of the large
+                                                           # datasets, filled in by the worker (see _precompress_sensor_values)
+    hdf5_part: str | None = None                           # Part file the worker wrote this file's group into (see HDF5_PARTS_DIRECTORY)
+    extraction_error: str | None = None
+    extraction_warning: str | None = None
+
+
+# --- Helper to Spot-Check Timestamp Spacing (--strict) ---
+def _timestamps_look_uniform(timestamps, time_step, num_checks=100):
+    """
+    Compares num_checks randomly chosen gaps between neighbouring timestamps against time_step.
+    Works on TimeAxis and on plain arrays, and only reads the sampled positions.
+    """
+    num_samples = len(timestamps)
+    rng = np.random.default_rng()
+    for i in rng.integers(1, num_samples, size=min(num_checks, num_samples - 1)):
+        if not np.isclose(timestamps[i] - timestamps[i - 1], time_step, rtol=1e-6):
+            return False
+    return True
 
 
 # --- Function to Extract Data from .mat files (Vibration, Acoustic) ---
@@ -138,333 +337,326 @@ def extract_data_from_mat(filepath, metadata):
     """
     Extracts data, timestamp/sample rate from .mat files based on observed structured array nesting.
     Handles a deeper nested format found in vibration/acoustic files.
+    Reads the HDF5 sidecar instead of the .mat file when an up-to-date one exists.
     """
-    extracted_info = {
-        'metadata': metadata, # Store the metadata dictionary including filepath
-        'sensor_values': {},          # {descriptive_name: np.array}
-        'timestamps': None,           # numpy array of timestamps
-        'sample_rate': None,          # float
-        'inferred_sensor_type': metadata.get('sensor_type', 'Mat_Unknown_Structure') # Start with sensor_type hint from path
-    }
+    # Start with sensor_type hint from path
+    extracted_info = ExtractionResult(metadata, inferred_sensor_type=metadata.get('sensor_type', 'Mat_Unknown_Structure'))
 
-    print(f"  Attempting to extract data from .mat file...")
+    logger.debug("  Attempting to extract data from .mat file...")
 
     try:
-        mat_data = sio.loadmat(filepath)
-
-        # --- Try to find the main signal container ('Signal' or 'signal') ---
-        main_data_key = None
-        if 'Signal' in mat_data:
-             main_data_key = 'Signal'
-        elif 'signal' in mat_data:
-             main_data_key = 'signal'
-        else:
-             print(f"  Error: Neither 'Signal' nor 'signal' key found at root. Keys found: {list(mat_data.keys())}")
-             return None # Fail if main key isn't found
-
-        signal_container = mat_data[main_data_key]
-
-        # --- Debugging Mat Structure ---
-        # UNCOMMENT THE LINE BELOW TEMPORARILY TO PRINT DETAILED STRUCTURE FOR DEBUGGING MAT FILES
-        # print("\n  --- Debugging Mat Structure ---")
-        # print_mat_structure(signal_container)
-        # print("  --- End Debugging ---\n")
-        # --- End Debugging ---
-
-
-        # --- Handle the observed (1,1) structured array format ---
-        main_record = None
-        if (isinstance(signal_container, np.ndarray) and
-            signal_container.shape == (1, 1) and
-            signal_container.dtype.hasobject): # Should be object dtype for structured array fields
-
-             # Access the single record within the (1,1) array
-             if signal_container.size > 0:
-                 record_candidate = signal_container[0, 0]
-
-                 # Check if this candidate is a structured array record (numpy.void) and has expected fields
-                 # Checking for 'x_values' and 'y_values' is a good indicator of this specific structure
-                 if isinstance(record_candidate, np.void) and 'x_values' in record_candidate.dtype.names and 'y_values' in record_candidate.dtype.names:
-                      main_record = record_candidate
-                      # inferred_type already set based on metadata path hint, refine if needed
-                      # extracted_info['inferred_sensor_type'] = metadata.get('sensor_type', 'Mat_Structured') # Update type based on format + path
-
-                 else:
-                      print(f"  Error: Found (1,1) object array, but element [0,0] is not a numpy.void with 'x_values'/'y_values' fields (type: {type(record_candidate)}, dtype: {getattr(record_candidate, 'dtype', 'N/A')}).")
-             else:
-                  print(f"  Error: Found (1,1) object array, but it is empty.")
-
-
-        if main_record is None:
-             print(f"  Error: Could not find the expected main data in the structured array format within key '{main_data_key}'.")
-             return None # Indicate failure if we can't get the main data record
-
-
-        # --- Extract Time Information (start, increment, num_values) from 'x_values' ---
+        # Raw fields of the signal, taken either from the sidecar or from the .mat structure below
+        values_array_candidate = None # Content of 'values' in 'y_values'
         start_value = None
         increment = None
         number_of_values = None
 
-        try:
-            # Access the content of 'x_values'. Debug output shows it's likely a (1,1) object array holding another record.
-            x_data_container = main_record['x_values']
-
-            if isinstance(x_data_container, np.ndarray) and x_data_container.shape == (1, 1) and x_data_container.dtype.hasobject and x_data_container.size > 0:
-                 time_info_struct_candidate = x_data_container[0, 0]
-
-                 # Check if this inner candidate is a numpy.void with time fields
-                 if isinstance(time_info_struct_candidate, np.void) and 'start_value' in time_info_struct_candidate.dtype.names and 'increment' in time_info_struct_candidate.dtype.names and 'number_of_values' in time_info_struct_candidate.dtype.names:
-
-                      # Extract the scalar values, handling potential (1,1) array wrapping
-                      # Use .flatten()[0] to reliably get the scalar value from potentially nested arrays
-                      try:
-                          start_value_raw = time_info_struct_candidate['start_value']
-                          if isinstance(start_value_raw, np.ndarray) and start_value_raw.size > 0:
-                              start_value = float(start_value_raw.flatten()[0])
-                          elif np.isscalar(start_value_raw): # Handle direct scalar if present
-                              start_value = float(start_value_raw)
-                          else: raise ValueError("start_value not found or not scalar/scalar array")
-
-
-                          increment_raw = time_info_struct_candidate['increment']
-                          if isinstance(increment_raw, np.ndarray) and increment_raw.size > 0:
-                              increment = float(increment_raw.flatten()[0])
-                          elif np.isscalar(increment_raw):
-                               increment = float(increment_raw)
-                          else: raise ValueError("increment not found or not scalar/scalar array")
-
-
-                          num_values_raw = time_info_struct_candidate['number_of_values']
-                          if isinstance(num_values_raw, np.ndarray) and num_values_raw.size > 0:
-                              # number_of_values might be an integer, but int() is safe if it's a number
-                              num_values_flat = num_values_raw.flatten()[0]
-                              if np.isscalar(num_values_flat):
-                                   number_of_values = int(num_values_flat)
-                              else: raise ValueError("number_of_values flatten result is not scalar")
-                          elif np.isscalar(num_values_raw):
-                               number_of_values = int(num_values_raw)
-                          else: raise ValueError("number_of_values not found or not scalar/scalar array")
-
-
-                          print(f"  Extracted time parameters: start={start_value}, increment={increment}, num_values={number_of_values}")
-
-                          # Reconstruct timestamps and calculate sample rate if parameters are valid
-                          if increment is not None and increment > 0 and number_of_values is not None and number_of_values > 0:
-                              extracted_info['sample_rate'] = 1.0 / increment
-                              extracted_info['timestamps'] = np.arange(number_of_values) * increment + start_value
-                              print(f"  Reconstructed timestamps array of shape {extracted_info['timestamps'].shape} with sample rate {extracted_info['sample_rate']:.2f} Hz.")
-                          else:
-                               print("  Warning: Invalid time parameters found (increment <= 0 or num_values <= 0). Cannot reconstruct time info.")
-
-
-                      except (KeyError, ValueError, TypeError) as e:
-                           print(f"  Warning: Error extracting scalar values from time info struct fields: {e}. Cannot reconstruct time info.")
-                      except Exception as e:
-                           print(f"  Warning: An unexpected error occurred during time parameter extraction: {e}. Cannot reconstruct time info.")
+        sidecar_fields = _read_mat_sidecar(filepath)
+        if sidecar_fields is not None:
+             values_array_candidate, start_value, increment, number_of_values = sidecar_fields
+             logger.debug("  Loaded signal from HDF5 sidecar %s.", os.path.basename(_mat_sidecar_path(filepath)))
+             if start_value is not None and increment is not None and number_of_values is not None:
+                  logger.debug("  Extracted time parameters: start=%s, increment=%s, num_values=%s", start_value, increment, number_of_values)
 
+        else:
+             # --- Fast path: let scipy squeeze the 1x1 wrappers and return mat_struct objects ---
+             mtime = os.path.getmtime(filepath)
+             signal_fields = _read_signal_fields(_load_mat_cached(filepath, mtime, squeeze_me=True, struct_as_record=False))
+             if signal_fields is not None:
+                  values_array_candidate, start_value, increment, number_of_values = signal_fields
+                  logger.debug("  Extracted time parameters: start=%s, increment=%s, num_values=%s", start_value, increment, number_of_values)
 
-                 else:
-                      print(f"  Warning: 'x_values' content at [0,0] is not a numpy.void with time fields (type: {type(time_info_struct_candidate)}, dtype: {getattr(time_info_struct_candidate, 'dtype', 'N/A')}). Cannot reconstruct time info.")
-
-            else:
-                 print(f"  Warning: 'x_values' field had unexpected type/shape {type(x_data_container)} {getattr(x_data_container, 'shape', 'N/A')}. Expected (1,1) object array. Cannot reconstruct time info.")
-            # Note: We don't return failure here yet, as we might still get sensor data without time/rate
-
-        except KeyError:
-             print(f"  Warning: Could not find 'x_values' field in the structured record. Time info missing.")
-        except Exception as e:
-             print(f"  Warning: Error accessing 'x_values' field: {e}. Time info may be incomplete.")
-
+             else:
+                  # Fall back to walking the record arrays by hand, which also reports what exactly is missing
+                  mat_data = _load_mat_cached(filepath, mtime, squeeze_me=False, struct_as_record=True)
+
+                  # --- Try to find the main signal container ('Signal' or 'signal') ---
+                  main_data_key = None
+                  if 'Signal' in mat_data:
+                       main_data_key = 'Signal'
+                  elif 'signal' in mat_data:
+                       main_data_key = 'signal'
+                  else:
+                       # Only the signal variable was loaded, so list the variables from the file headers instead
+                       logger.error("  Error: Neither 'Signal' nor 'signal' key found at root. Variables found: %s", [name for name, _, _ in sio.whosmat(filepath)])
+                       return None # Fail if main key isn't found
+
+                  signal_container = mat_data[main_data_key]
+
+                  # --- Debugging Mat Structure (only with --debug) ---
+                  if logger.isEnabledFor(logging.DEBUG):
+                       from extraction_debug import print_mat_structure
+                       print("\n  --- Debugging Mat Structure ---")
+                       print_mat_structure(signal_container, name=main_data_key)
+                       print("  --- End Debugging ---\n")
+                  # --- End Debugging ---
+
+
+                  # --- Handle the observed (1,1) structured array format ---
+                  main_record = None
+                  if (isinstance(signal_container, np.ndarray) and
+                      signal_container.shape == (1, 1) and
+                      signal_container.dtype.hasobject): # Should be object dtype for structured array fields
+
+                       # Access the single record within the (1,1) array
+                       if signal_container.size > 0:
+                           record_candidate = signal_container[0, 0]
+
+                           # Check if this candidate is a structured array record (numpy.void) and has expected fields
+                           # Checking for 'x_values' and 'y_values' is a good indicator of this specific structure
+                           if isinstance(record_candidate, np.void) and 'x_values' in record_candidate.dtype.names and 'y_values' in record_candidate.dtype.names:
+                                main_record = record_candidate
+                                # inferred_type already set based on metadata path hint, refine if needed
+                                # extracted_info.inferred_sensor_type = metadata.get('sensor_type', 'Mat_Structured') # Update type based on format + path
 
-        # --- Extract Sensor Values from 'y_values' ---
-        try:
-            # Access the content of 'y_values'. Debug output suggests it's a (1,1) object array holding another record.
-            y_data_container = main_record['y_values']
-
-            if isinstance(y_data_container, np.ndarray) and y_data_container.shape == (1, 1) and y_data_container.dtype.hasobject and y_data_container.size > 0:
-                 sensor_data_struct_candidate = y_data_container[0, 0]
-
-                 # Check if this inner candidate is a numpy.void with a 'values' field
-                 if isinstance(sensor_data_struct_candidate, np.void) and 'values' in sensor_data_struct_candidate.dtype.names:
-
-                      # Access the actual data array, handling potential (1,1) array wrapping
-                      values_array_candidate = sensor_data_struct_candidate['values']
-
-                      # Check if the final content is a numeric numpy array
-                      if isinstance(values_array_candidate, np.ndarray) and values_array_candidate.dtype.kind in 'fiu' and values_array_candidate.size > 0:
-                           # Determine a descriptive name based on the sensor type hint
-                           sensor_name_suffix = "_Signal"
-                           # Keep original sensor type hint from path if available
-                           sensor_type_hint = metadata.get('sensor_type', 'Mat')
-                           if sensor_type_hint == 'Vibration':
-                                extracted_info['inferred_sensor_type'] = 'Vibration (Structured Mat)'
-                                sensor_name = 'Vibration' + sensor_name_suffix
-                           elif sensor_type_hint == 'Acoustic':
-                                extracted_info['inferred_sensor_type'] = 'Acoustic (Structured Mat)'
-                                sensor_name = 'Acoustic' + sensor_name_suffix
                            else:
-                                extracted_info['inferred_sensor_type'] = 'Mat_Structured_Unknown'
-                                sensor_name = sensor_type_hint + sensor_name_suffix
-
-
-                           # Ensure data is in (N, M) shape where N is samples, M is channels.
-                           # If it's 1D (N,), make it (N, 1)
-                           # If it's >2D, flatten to (N, 1)
-                           sensor_values_array = values_array_candidate
-                           if values_array_candidate.ndim == 1:
-                                sensor_values_array = values_values_array_candidate.reshape(-1, 1)
-                           elif values_array_candidate.ndim > 2:
-                                print(f"  Warning: 'y_values' content 'values' had unexpected dimension {values_array_candidate.ndim}. Flattening to (N, 1).")
-                                sensor_values_array = values_array_candidate.flatten().reshape(-1, 1)
-
-
-                           extracted_info['sensor_values'][sensor_name] = sensor_values_array
-                           print(f"  Extracted sensor data '{sensor_name}' from 'y_values' ('values' field) (shape {sensor_values_array.shape}).")
-
-                           # Cross-check number of samples with number_of_values from x_values
-                           if number_of_values is not None and sensor_values_array.shape[0] != number_of_values:
-                               # This warning is useful, but doesn't necessarily mean failure if sensor data was read
-                               print(f"  Warning: Number of samples from 'y_values' ({sensor_values_array.shape[0]}) does not match 'number_of_values' from 'x_values' ({number_of_values}). Using sensor data length for timestamps if needed.")
-
-                           # Check if the sensor data array is actually empty (size 0) - already checked with values_array_candidate.size > 0
-
-
-                      else:
-                           print(f"  Error: 'y_values' content 'values' had unexpected type/shape {type(values_array_candidate)} {getattr(values_array_candidate, 'shape', 'N/A')} {getattr(values_array_candidate, 'dtype', 'N/A')}. Cannot extract sensor values.")
-                           extracted_info['sensor_values'] = {} # Ensure empty on failure
-
-                 else:
-                      print(f"  Error: 'y_values' content at [0,0] is not a numpy.void with 'values' field (type: {type(sensor_data_struct_candidate)}, dtype: {getattr(sensor_data_struct_candidate, 'dtype', 'N/A')}). Cannot extract sensor values.")
-                      extracted_info['sensor_values'] = {} # Ensure empty on failure
+                                logger.error("  Error: Found (1,1) object array, but element [0,0] is not a numpy.void with 'x_values'/'y_values' fields (type: %s, dtype: %s).", type(record_candidate), getattr(record_candidate, 'dtype', 'N/A'))
+                       else:
+                            logger.error("  Error: Found (1,1) object array, but it is empty.")
+
+
+                  if main_record is None:
+                       logger.error("  Error: Could not find the expected main data in the structured array format within key '%s'.", main_data_key)
+                       return None # Indicate failure if we can't get the main data record
+
+
+                  # --- Extract Time Information (start, increment, num_values) from 'x_values' ---
+                  # 'x_values' is a 1x1 struct whose fields each hold a 1x1 array
+                  try:
+                      start_value_raw, increment_raw, num_values_raw = _unwrap_struct(main_record['x_values'], _X_VALUES_FIELDS)
+                      # .item() reads the single element as a Python scalar without copying the array;
+                      # it raises ValueError for empty (or multi-element) fields, handled below
+                      start_value = float(np.asarray(start_value_raw).item())
+                      increment = float(np.asarray(increment_raw).item())
+                      # number_of_values might be stored as a double, but int() is safe if it's a number
+                      number_of_values = int(np.asarray(num_values_raw).item())
+                      logger.debug("  Extracted time parameters: start=%s, increment=%s, num_values=%s", start_value, increment, number_of_values)
+                  except Exception as e:
+                       # Note: We don't return failure here, as we might still get sensor data without time/rate
+                       logger.warning("  Warning: Could not extract time parameters from 'x_values': %s. Cannot reconstruct time info.", e)
+                       start_value = increment = number_of_values = None # Only use complete time parameters
+
+
+                  # --- Extract Sensor Values from 'y_values' ---
+                  # 'y_values' is a 1x1 struct whose 'values' field holds the signal array
+                  try:
+                      values_array_candidate = _unwrap_struct(main_record['y_values'], _Y_VALUES_FIELDS)
+                  except Exception as e:
+                       logger.error("  Error: Could not extract the 'values' field from 'y_values': %s. Cannot extract sensor values.", e)
+                       values_array_candidate = None
+
+             # Check if the final content is a numeric numpy array before using (and caching) it
+             if values_array_candidate is not None and not (isinstance(values_array_candidate, np.ndarray) and values_array_candidate.dtype.kind in 'fiu' and values_array_candidate.size > 0):
+                  logger.error("  Error: 'y_values' content 'values' had unexpected type/shape %s %s %s. Cannot extract sensor values.", type(values_array_candidate), getattr(values_array_candidate, 'shape', 'N/A'), getattr(values_array_candidate, 'dtype', 'N/A'))
+                  values_array_candidate = None
+
+             # Cache the raw signal so the next run can skip the .mat parsing
+             if values_array_candidate is not None:
+                  _write_mat_sidecar(filepath, values_array_candidate, start_value, increment, number_of_values)
+
+
+        # --- Reconstruct timestamps and calculate sample rate if time parameters are valid ---
+        if start_value is not None and increment is not None and number_of_values is not None:
+             if increment > 0 and number_of_values > 0:
+                 extracted_info.sample_rate = 1.0 / increment
+                 # Kept lazy; the array is only built (with np.linspace) by consumers that need all of it
+                 extracted_info.timestamps = TimeAxis(start_value, increment, number_of_values)
+                 logger.debug("  Reconstructed time axis of %s samples with sample rate %.2f Hz.", len(extracted_info.timestamps), extracted_info.sample_rate)
+             else:
+                  logger.warning("  Warning: Invalid time parameters found (increment <= 0 or num_values <= 0). Cannot reconstruct time info.")
 
-            else:
-                 print(f"  Error: 'y_values' field had unexpected type/shape {type(y_data_container)} {getattr(y_data_container, 'shape', 'N/A')}. Expected (1,1) object array. Cannot extract sensor values.")
-                 extracted_info['sensor_values'] = {} # Ensure empty on failure
 
+        # --- Store Sensor Values ---
+        if values_array_candidate is not None:
+            try:
+                # Determine a descriptive name based on the sensor type hint
+                sensor_name_suffix = "_Signal"
+                # Keep original sensor type hint from path if available
+                sensor_type_hint = metadata.get('sensor_type', 'Mat')
+                if sensor_type_hint == 'Vibration':
+                     extracted_info.inferred_sensor_type = 'Vibration (Structured Mat)'
+                     sensor_name = 'Vibration' + sensor_name_suffix
+                elif sensor_type_hint == 'Acoustic':
+                     extracted_info.inferred_sensor_type = 'Acoustic (Structured Mat)'
+                     sensor_name = 'Acoustic' + sensor_name_suffix
+                else:
+                     extracted_info.inferred_sensor_type = 'Mat_Structured_Unknown'
+                     sensor_name = sensor_type_hint + sensor_name_suffix
+
+
+                # Ensure data is in (N, M) shape where N is samples, M is channels.
+                # If it's 1D (N,), make it (N, 1)
+                # If it's >2D, flatten to (N, 1)
+                # reshape only copies when the layout requires it
+                sensor_values_array = values_array_candidate
+                if values_array_candidate.ndim == 1:
+                     sensor_values_array = values_array_candidate.reshape(-1, 1)
+                elif values_array_candidate.ndim > 2:
+                     logger.warning("  Warning: 'y_values' content 'values' had unexpected dimension %s. Flattening to (N, 1).", values_array_candidate.ndim)
+                     sensor_values_array = values_array_candidate.reshape(-1, 1)
+
+                # Store as one C-contiguous float32 buffer: half the memory of float64 and friendlier to vectorized downstream processing
+                sensor_values_array = np.ascontiguousarray(sensor_values_array, dtype=np.float32)
+
+
+                if sensor_values_array.shape[1] > 1:
+                     # Multi-channel signal: store each channel as its own 1-D contiguous buffer (SoA), so consumers
+                     # that scan one channel stream only that channel through memory. np.copy gives each its own buffer.
+                     for ch in range(sensor_values_array.shape[1]):
+                          extracted_info.sensor_values[f'{sensor_name}_ch{ch}'] = np.copy(sensor_values_array[:, ch], order='C')
+                     logger.debug("  Extracted sensor data '%s' from 'y_values' ('values' field) as %s channels of %s samples.", sensor_name, sensor_values_array.shape[1], sensor_values_array.shape[0])
+                else:
+                     extracted_info.sensor_values[sensor_name] = sensor_values_array
+                     logger.debug("  Extracted sensor data '%s' from 'y_values' ('values' field) (shape %s).", sensor_name, sensor_values_array.shape)
+
+                # Cross-check number of samples with number_of_values from x_values
+                if number_of_values is not None and sensor_values_array.shape[0] != number_of_values:
+                    # This warning is useful, but doesn't necessarily mean failure if sensor data was read
+                    logger.warning("  Warning: Number of samples from 'y_values' (%s) does not match 'number_of_values' from 'x_values' (%s). Using sensor data length for timestamps if needed.", sensor_values_array.shape[0], number_of_values)
 
-        except KeyError:
-             print(f"  Error: Could not find 'y_values' field in the structured record or 'values' field in the inner struct. Cannot extract sensor values.")
-             extracted_info['sensor_values'] = {} # Ensure empty on failure
-        except Exception as e:
-             print(f"  Error extracting sensor data from 'y_values': {e}.")
-             # import traceback; traceback.print_exc()
-             extracted_info['sensor_values'] = {} # Ensure empty on failure
+            except Exception as e:
+                 logger.error("  Error extracting sensor data from 'y_values': %s.", e, exc_info=LOG_TRACEBACKS)
+                 extracted_info.sensor_values = {} # Ensure empty on failure
 
 
         # --- Final Checks and Cleanups ---
 
+        # One pass over the sensors: the non-empty ones give the sensor_names list and feed both fallbacks below
+        non_empty_sensors = [(name, arr) for name, arr in extracted_info.sensor_values.items() if arr.size > 0]
+        # Add sensor names list to info (using the descriptive names) - only for non-empty data
+        extracted_info.sensor_names = [name for name, _ in non_empty_sensors]
+        has_sensor_data = bool(non_empty_sensors)
+
         # If timestamps were not reconstructed but sample rate is known AND we have sensor data, regenerate a placeholder time vector
         # This is a fallback if 'x_values' structure is different or extraction fails for time info
-        if extracted_info['timestamps'] is None and extracted_info['sample_rate'] is not None and extracted_info['sensor_values'] and any(arr.size > 0 for arr in extracted_info['sensor_values'].values()):
-             print("  Timestamps not found from 'x_values', but sample rate exists and non-empty sensor data was extracted. Generating time vector from sensor data length.")
+        if extracted_info.timestamps is None and extracted_info.sample_rate is not None and has_sensor_data:
+             logger.debug("  Timestamps not found from 'x_values', but sample rate exists and non-empty sensor data was extracted. Generating time vector from sensor data length.")
              # Get number of samples from the first extracted NON-EMPTY sensor array
-             first_non_empty_sensor_name = next((name for name, arr in extracted_info['sensor_values'].items() if arr.size > 0), None)
-             if first_non_empty_sensor_name:
-                 num_samples = extracted_info['sensor_values'][first_non_empty_sensor_name].shape[0]
-                 # Assume start time is 0 if not found/extracted
-                 extracted_info['timestamps'] = np.arange(num_samples) / extracted_info['sample_rate']
-                 print(f"  Generated timestamps array of shape {extracted_info['timestamps'].shape}.")
-             # else: Warning already printed if no non-empty data found
+             num_samples = non_empty_sensors[0][1].shape[0]
+             # Assume start time is 0 if not found/extracted
+             extracted_info.timestamps = TimeAxis(0.0, 1.0 / extracted_info.sample_rate, num_samples)
+             logger.debug("  Generated time axis of %s samples.", len(extracted_info.timestamps))
 
         # If sample rate wasn't calculated from increment but timestamps were generated, calculate from timestamps as a fallback
         # Ensure timestamps exist AND we have sensor data
-        elif extracted_info['sample_rate'] is None and extracted_info['timestamps'] is not None and len(extracted_info['timestamps']) > 1 and extracted_info['sensor_values'] and any(arr.size > 0 for arr in extracted_info['sensor_values'].values()):
-             print("  Sample rate not found from 'x_values', but timestamps exist. Calculating sample rate.")
-             time_diffs = np.diff(extracted_info['timestamps'])
-             positive_diffs = time_diffs[time_diffs > 0]
-             if len(positive_diffs) > 0:
-                  extracted_info['sample_rate'] = 1.0 / np.mean(positive_diffs)
-                  print(f"  Calculated sample rate from timestamps: {extracted_info['sample_rate']:.2f} Hz")
-             elif len(np.unique(time_diffs)) == 1 and time_diffs[0] > 0:
-                  extracted_info['sample_rate'] = 1.0 / time_diffs[0]
-                  print(f"  Calculated sample rate from uniform timestamps: {extracted_info['sample_rate']:.2f} Hz")
+        elif extracted_info.sample_rate is None and extracted_info.timestamps is not None and len(extracted_info.timestamps) > 1 and has_sensor_data:
+             logger.debug("  Sample rate not found from 'x_values', but timestamps exist. Calculating sample rate.")
+             # Signals here are uniformly sampled, so the first gap gives the rate without a pass over all N samples
+             timestamps = extracted_info.timestamps
+             if timestamps[1] > timestamps[0]:
+                  time_step = timestamps[1] - timestamps[0]
+                  extracted_info.sample_rate = 1.0 / time_step
+                  logger.debug("  Calculated sample rate from timestamps: %.2f Hz", extracted_info.sample_rate)
+                  if STRICT_TIMESTAMP_CHECKS and not _timestamps_look_uniform(timestamps, time_step):
+                       logger.warning("  Warning: Timestamps of %s are not evenly spaced; sample rate %.2f Hz is taken from the first two samples.", metadata['filename'], extracted_info.sample_rate)
              else:
-                  print("  Warning: Could not calculate sample rate from generated timestamps (non-uniform/zero differences).")
-
-
-        # Add sensor names list to info (using the descriptive names) - only for non-empty data
-        extracted_info['sensor_names'] = [name for name, arr in extracted_info['sensor_values'].items() if arr.size > 0] # List only sensors with non-empty data
+                  logger.warning("  Warning: Could not calculate sample rate from generated timestamps (non-increasing first samples).")
 
         # Final check for critical missing info *after* fallbacks
-        if not extracted_info['sensor_values'] or not extracted_info['sensor_names']:
-             print(f"  Final Extraction Result: Failed. No non-empty sensor values successfully extracted from {metadata['filename']}.")
+        if not has_sensor_data:
+             logger.warning("  Final Extraction Result: Failed. No non-empty sensor values successfully extracted from %s.", metadata['filename'])
              # Add specific error message if not already present
-             if 'extraction_error' not in extracted_info:
-                 extracted_info['extraction_error'] = "No non-empty sensor values extracted."
-             # Do NOT return None here. Return the info dict with empty sensor_values.
+             if extracted_info.extraction_error is None:
+                 extracted_info.extraction_error = "No non-empty sensor values extracted."
+             # Do NOT return None here. Return the result with empty sensor_values.
              # The main loop will handle classifying this as metadata_only or failed based on sensor_values content.
-             return extracted_info # Return info dict even if empty data
+             return extracted_info # Return the result even if empty data
 
         # Warnings if time info is completely missing but data exists
-        if extracted_info['timestamps'] is None:
-             print(f"  Warning: Could not find or generate timestamps for {metadata['filename']}, but sensor data was extracted.")
+        if extracted_info.timestamps is None:
+             logger.warning("  Warning: Could not find or generate timestamps for %s, but sensor data was extracted.", metadata['filename'])
 
-        if extracted_info['sample_rate'] is None:
-             print(f"  Warning: Could not find or derive sample rate for {metadata['filename']}, but sensor data was extracted.")
+        if extracted_info.sample_rate is None:
+             logger.warning("  Warning: Could not find or derive sample rate for %s, but sensor data was extracted.", metadata['filename'])
 
 
     except FileNotFoundError:
-        print(f"  Error: .mat file not found at {filepath}")
-        extracted_info['extraction_error'] = "File not found."
-        return extracted_info # Return info dict even if file not found
+        logger.error("  Error: .mat file not found at %s", filepath)
+        extracted_info.extraction_error = "File not found."
+        return extracted_info # Return the result even if file not found
     except Exception as e:
-        print(f"  An unexpected error occurred while processing {filepath}: {e}")
-        # import traceback; traceback.print_exc() # Uncomment for detailed error
-        extracted_info['extraction_error'] = f"Unhandled error: {e}"
-        return extracted_info # Return info dict even on unhandled error
+        logger.error("  An unexpected error occurred while processing %s: %s", filepath, e, exc_info=LOG_TRACEBACKS)
+        extracted_info.extraction_error = f"Unhandled error: {e}"
+        return extracted_info # Return the result even on unhandled error
 
-    print(f"  Final Extraction Result: Success. Successfully extracted data from .mat file.")
+    logger.debug("  Final Extraction Result: Success. Successfully extracted data from .mat file.")
     return extracted_info
 
 
+# --- Raw Integer TDMS Channels with a Linear Scale ---
+# DAQ channels are often stored as 8/16-bit ADC counts with a linear scale in the properties, which nptdms turns into
+# float64. Such channels are kept as the raw counts instead (2 bytes per sample instead of 4 as float32), together
+# with the slope and intercept; consumers get the scaled values back with raw.astype(np.float32) * slope + intercept.
+_RAW_INTEGER_DTYPES = frozenset(np.dtype(t) for t in ('int8', 'uint8', 'int16', 'uint16'))
+_TDMS_RAW_DATA_INPUT_SOURCE = 0xFFFFFFFF # NI_Scale[n]_Linear_Input_Source value meaning "the raw data"
+
+def _raw_linear_scaling(channel_obj):
+    """
+    Returns (slope, intercept) if the channel holds raw 8/16-bit integers with exactly one linear scale applied to
+    them, i.e. its scaled values are raw * slope + intercept. Returns None for anything else (float data, DAQmx
+    data, polynomial/thermocouple/... or chained scales), which is read as scaled data as before.
+    """
+    nptype = getattr(channel_obj.data_type, 'nptype', None) # None for DAQmx raw data
+    if nptype is None or np.dtype(nptype) not in _RAW_INTEGER_DTYPES:
+        return None
+    properties = channel_obj.properties
+    try:
+        if (int(properties.get('NI_Number_Of_Scales', 0)) != 1 or
+            properties.get('NI_Scaling_Status', 'unscaled') == 'scaled' or # Values were written already scaled
+            properties.get('NI_Scale[0]_Scale_Type') != 'Linear' or
+            int(properties.get('NI_Scale[0]_Linear_Input_Source', _TDMS_RAW_DATA_INPUT_SOURCE)) != _TDMS_RAW_DATA_INPUT_SOURCE):
+             return None
+        return float(properties['NI_Scale[0]_Linear_Slope']), float(properties['NI_Scale[0]_Linear_Y_Intercept'])
+    except (KeyError, ValueError, TypeError):
+        return None
+
+# Raw channel name -> suffix that tells apart channels with the same descriptive name (one str.translate pass)
+_TDMS_CHANNEL_SUFFIX = str.maketrans({'/': '_', '~': '_'})
+
+
 # --- Function to Extract Data from .tdms files (Temp_Current) ---
 # Keep this function AS IS from the previous version.
-# It will return extracted_info even if sensor_values is empty.
+# It will return its ExtractionResult even if sensor_values is empty.
 def extract_data_from_tdms(filepath, metadata, tdms_group_name, tdms_channel_names):
      """
      Extracts data, timestamp/sample rate, and channel properties from .tdms files.
      Uses properties to generate more descriptive sensor names.
      Explicitly handles read errors for individual channels.
      Returns info even if no sensor values could be read.
+     tdms_channel_names is a set of raw channel names (any iterable of names works).
      """
-     extracted_info = {
-          'metadata': metadata, # Store the metadata dictionary including filepath
-          'sensor_values': {},          # {descriptive_name: np.array} - Only non-empty data stored here
-          'raw_channel_names': [],      # List of original DAQ channel names found and successfully read data from (non-empty)
-          'channel_properties': {},     # {descriptive_name: {property_key: value}} - Properties for channels with non-empty data
-          'all_channel_properties_raw': {}, # {raw_channel_name: {property_key: value}} - Properties for ALL configured channels found
-          'timestamps': None,           # numpy array of timestamps
-          'sample_rate': None,          # float
-          'inferred_sensor_type': 'Temp_Current (TDMS)' # TDMS files have a consistent type here
-     }
-
-     print(f"  Attempting to extract data from .tdms file...")
+     # TDMS files have a consistent sensor type here
+     extracted_info = ExtractionResult(metadata, inferred_sensor_type='Temp_Current (TDMS)')
+
+     logger.debug("  Attempting to extract data from .tdms file...")
+     wanted_channel_names = frozenset(tdms_channel_names) # O(1) membership checks below; no copy if it already is a frozenset
 
      try:
+          # Streaming open: only metadata is read here. Channel data is streamed below with data_chunks().
           with TdmsFile.open(filepath) as tdms_file:
 
-              # --- TDMS DEBUGGING: Print all groups ---
-              # print(f"  TDMS Groups found: {[g.name for g in tdms_file.groups()]}") # <-- UNCOMMENT THIS LINE FOR DEBUGGING TDMS FILES
+              # --- TDMS DEBUGGING: Print all groups (only with --debug) ---
+              if logger.isEnabledFor(logging.DEBUG):
+                   logger.debug("  TDMS Groups found: %s", [g.name for g in tdms_file.groups()])
               # --- End TDMS Debugging ---
 
-              found_group = None
-              # all_group_names_in_file = [g.name for g in tdms_file.groups()] # Avoid re-creating this list if not debugging
-              for g in tdms_file.groups():
-                  if g.name == tdms_group_name:
-                       found_group = g
-                       break
+              # Look the group up by name; this only touches the metadata read by TdmsFile.open
+              try:
+                   found_group = tdms_file[tdms_group_name]
+              except KeyError:
+                   found_group = None
 
               if found_group is None:
-                   print(f"  Error: TDMS group '{tdms_group_name}' not found in this file.")
+                   logger.error("  Error: TDMS group '%s' not found in this file.", tdms_group_name)
                    # Return partial info with error indication
-                   extracted_info['extraction_error'] = f"Group '{tdms_group_name}' not found."
+                   extracted_info.extraction_error = f"Group '{tdms_group_name}' not found."
                    return extracted_info # Return info even if group not found
 
-              print(f"  Successfully found TDMS group: '{found_group.name}'")
+              logger.debug("  Successfully found TDMS group: '%s'", found_group.name)
 
-              # --- TDMS DEBUGGING: Print all channels in the found group ---
-              # UNCOMMENT THE LINE BELOW FOR DEBUGGING TDMS FILES
-              # print(f"  Channels found in group '{found_group.name}': {[c.name for c in found_group.channels()]}")
+              # --- TDMS DEBUGGING: Print all channels in the found group (only with --debug) ---
+              if logger.isEnabledFor(logging.DEBUG):
+                   logger.debug("  Channels found in group '%s': %s", found_group.name, [c.name for c in found_group.channels()])
               # --- End TDMS Debugging ---
 
 
@@ -473,74 +665,128 @@ def extract_data_from_tdms(filepath, metadata, tdms_group_name, tdms_channel_nam
               # First pass: Collect properties for *all* configured channels found in the group
               configured_channels_found_objs = [] # Store channel objects for configured names found
               for channel_obj in found_group.channels(): # Iterate all channels in the group
-                   if channel_obj.name in tdms_channel_names: # Check if this channel is one we care about
+                   if channel_obj.name in wanted_channel_names: # Check if this channel is one we care about
                         configured_channels_found_objs.append(channel_obj)
-                        # Store properties using raw name
-                        extracted_info['all_channel_properties_raw'][channel_obj.name] = dict(channel_obj.properties)
+                        channel_properties = channel_obj.properties
+                        # Store properties using raw name. nptdms already keeps them in a dict per channel, so keep a
+                        # reference instead of copying it (nothing below modifies the properties)
+                        extracted_info.all_channel_properties_raw[channel_obj.name] = channel_properties
 
                         # Try to get sample rate hint from this channel's properties
-                        if temp_sample_rate is None and 'wf_increment' in channel_obj.properties and channel_obj.properties['wf_increment'] is not None and channel_obj.properties['wf_increment'] > 0:
-                             try:
-                                 temp_sample_rate = 1.0 / float(channel_obj.properties['wf_increment'])
-                                 # print(f"  Found sample rate hint from channel '{channel_obj.name}' properties: {temp_sample_rate:.2f} Hz") # Optional debug
-                             except (ValueError, TypeError) as e:
-                                  print(f"  Warning: Could not convert 'wf_increment' for channel '{channel_obj.name}' to float: {e}")
-                                  temp_sample_rate = None # Reset if conversion failed
+                        if temp_sample_rate is None:
+                             wf_increment = channel_properties.get('wf_increment')
+                             # nptdms normally gives a number already; only other values (e.g. strings) need a float() conversion
+                             if isinstance(wf_increment, (int, float, np.integer, np.floating)):
+                                  if wf_increment > 0:
+                                       temp_sample_rate = 1.0 / float(wf_increment)
+                                       # print(f"  Found sample rate hint from channel '{channel_obj.name}' properties: {temp_sample_rate:.2f} Hz") # Optional debug
+                             elif wf_increment is not None:
+                                  try:
+                                      wf_increment = float(wf_increment)
+                                      if wf_increment > 0:
+                                           temp_sample_rate = 1.0 / wf_increment
+                                  except (ValueError, TypeError) as e:
+                                       logger.warning("  Warning: Could not convert 'wf_increment' for channel '%s' to float: %s", channel_obj.name, e)
 
 
-              extracted_info['sample_rate'] = temp_sample_rate # Set sample rate if found
+              extracted_info.sample_rate = temp_sample_rate # Set sample rate if found
 
 
               if not configured_channels_found_objs:
-                   print(f"  Warning: No configured TDMS channels {tdms_channel_names} were found in group '{tdms_group_name}'. Cannot read data.")
+                   logger.warning("  Warning: No configured TDMS channels %s were found in group '%s'. Cannot read data.", sorted(wanted_channel_names), tdms_group_name)
                    # Return info with empty sensor_values and properties, but potentially sample_rate/metadata
-                   extracted_info['extraction_warning'] = "Configured channels not found in group."
+                   extracted_info.extraction_warning = "Configured channels not found in group."
                    return extracted_info # Return info even if no configured channels found
 
 
-              # Second pass: Attempt to read DATA for configured channels found
+              # Second pass: Read DATA for the configured channels found, one channel at a time.
+              # TdmsChannel.data_chunks() streams only this channel's data, one segment after the other, so the bytes of
+              # unconfigured channels in the group are never read or decoded (TdmsFile.data_chunks() would convert
+              # every channel of every group).
               channel_datas = {} # {raw_channel_name: data_array} - Only non-empty data stored here
 
-              print(f"  Attempting to read data for {len(configured_channels_found_objs)} configured channels found...")
-
-              # Iterate through the channel objects that match our configured names
+              # The number of values and the dtype of each channel are known from the metadata, so every channel gets a
+              # preallocated (num_values, 1) column that the segments are copied into; no concatenate or reshape copy later.
+              # float64 channels are allocated as float32 directly (like the .mat signals); other dtypes are kept.
+              channel_buffers = {}
+              values_read = {} # {raw_channel_name: number of values actually written into the buffer}
+              raw_channel_scaling = {} # {raw_channel_name: (slope, intercept)} for channels kept as raw integers
               for channel_obj in configured_channels_found_objs:
+                   scaling = _raw_linear_scaling(channel_obj)
+                   if scaling is not None:
+                        raw_channel_scaling[channel_obj.name] = scaling # Read unscaled below, not from the chunks
+                        continue
                    try:
-                        # Attempt to read the data for THIS channel
-                        channel_data = channel_obj.data # This is where the "Channel data has not been read" error occurs
-
-                        # Check if the data is not None and has size > 0
-                        if isinstance(channel_data, np.ndarray) and channel_data.size > 0:
-                            channel_datas[channel_obj.name] = channel_data # Store only if data is non-empty
-                            extracted_info['raw_channel_names'].append(channel_obj.name) # Track raw names with non-empty data
-                            print(f"  Successfully read NON-EMPTY data for channel: '{channel_obj.name}' (shape {channel_data.shape})")
-                        elif isinstance(channel_data, np.ndarray) and channel_data.size == 0:
-                            # print(f"  Successfully read EMPTY data for channel: '{channel_obj.name}' (shape {channel_data.shape}). Skipping for sensor_values.") # Optional debug
-                            pass # Do NOT add to channel_datas if empty
-
-                        else:
-                             print(f"  Warning: Read data for channel '{channel_obj.name}' is not a numpy array or has unexpected format ({type(channel_data)}). Skipping for sensor_values.")
-                             # extracted_info['extraction_warning'] = f"Data for channel {channel_obj.name} has unexpected format." # Add warning? Could get too noisy.
+                        # The dtype comes from the channel's scaling, which can be broken (e.g. DAQmx scales without scaler data)
+                        buffer_dtype = np.float32 if channel_obj.dtype.kind == 'f' and channel_obj.dtype.itemsize == 8 else channel_obj.dtype
+                        channel_buffers[channel_obj.name] = np.empty((len(channel_obj), 1), dtype=buffer_dtype)
+                   except Exception as e:
+                        logger.error("  Error reading data for TDMS channel '%s': %s. Skipping this channel for sensor_values.", channel_obj.name, e)
+                        extracted_info.channel_read_errors[channel_obj.name] = str(e) # Store the specific read error
+                        continue
+                   values_read[channel_obj.name] = 0
 
+              logger.debug("  Attempting to read data for %s configured channels found...", len(configured_channels_found_objs))
 
+              # Raw integer channels: read_data(scaled=False) returns the stored counts in their own dtype
+              raw_channel_datas = {}
+              for channel_obj in configured_channels_found_objs:
+                   if channel_obj.name in raw_channel_scaling:
+                        try:
+                             raw_channel_datas[channel_obj.name] = channel_obj.read_data(scaled=False).reshape(-1, 1) # (N, 1) view
+                        except Exception as e:
+                             logger.error("  Error reading data for TDMS channel '%s': %s. Skipping this channel for sensor_values.", channel_obj.name, e)
+                             extracted_info.channel_read_errors[channel_obj.name] = str(e) # Store the specific read error
+
+              # Scaled channels: each segment of the channel is written into its slot of the preallocated column
+              for channel_obj in configured_channels_found_objs:
+                   raw_channel_name = channel_obj.name
+                   if raw_channel_name not in channel_buffers:
+                        continue # Raw integer channel (read above) or no buffer
+                   column = channel_buffers[raw_channel_name]
+                   try:
+                        for channel_chunk in channel_obj.data_chunks():
+                             if len(channel_chunk) > 0:
+                                  column[channel_chunk.offset:channel_chunk.offset + len(channel_chunk), 0] = channel_chunk[:]
+                                  values_read[raw_channel_name] = channel_chunk.offset + len(channel_chunk)
                    except Exception as e:
-                       # Catch the specific "Channel data has not been read" or any other read error
-                       print(f"  Error reading data for TDMS channel '{channel_obj.name}': {e}. Skipping this channel for sensor_values.")
-                       extracted_info.setdefault('channel_read_errors', {})[channel_obj.name] = str(e) # Store the specific read error
-                       # import traceback; traceback.print_exc() # Uncomment for debugging read errors
+                        # E.g. missing scaling information; skip this channel
+                        logger.error("  Error reading data for TDMS channel '%s': %s. Skipping this channel for sensor_values.", raw_channel_name, e)
+                        extracted_info.channel_read_errors[raw_channel_name] = str(e) # Store the specific read error
+                        del channel_buffers[raw_channel_name]
+
+              for channel_obj in configured_channels_found_objs: # In channel order, raw and scaled channels alike
+                   raw_channel_name = channel_obj.name
+                   if raw_channel_name in raw_channel_datas:
+                        channel_data = raw_channel_datas[raw_channel_name]
+                   elif raw_channel_name in channel_buffers:
+                        # A truncated file can hold fewer values than its metadata announces; drop the unwritten tail (a view)
+                        channel_data = channel_buffers[raw_channel_name][:values_read[raw_channel_name]]
+                   else:
+                        continue # Read error, reported above
+                   # Store only if data is non-empty
+                   if channel_data.size > 0:
+                        channel_datas[raw_channel_name] = channel_data
+                        extracted_info.raw_channel_names.append(raw_channel_name) # Track raw names with non-empty data
+                        logger.debug("  Successfully read NON-EMPTY data for channel: '%s' (shape %s)", raw_channel_name, channel_data.shape)
+                   # else: channel has no data in this file; Do NOT add to channel_datas if empty
 
 
               # --- Process Collected NON-EMPTY Channel Data and Assign Descriptive Names ---
               # We only assign descriptive names and move properties for channels where we got NON-EMPTY data
-              print("  Processing collected NON-EMPTY channel data and assigning names...")
+              logger.debug("  Processing collected NON-EMPTY channel data and assigning names...")
               temp_count = 0 # Reset counters for naming based on *collected* data types
               current_count = 0
-              processed_channel_names = [] # Keep track of descriptive names added to extracted_info['sensor_values']
+              processed_channel_names = set() # Descriptive names added to extracted_info.sensor_values (set: O(1) duplicate check)
+
+              # Local names for the dictionaries filled in the loop (one lookup here instead of one per channel)
+              props_raw_all = extracted_info.all_channel_properties_raw
+              sensor_values = extracted_info.sensor_values
+              channel_properties_by_name = extracted_info.channel_properties
 
               # Iterate through channels whose data was successfully read AND is non-empty
-              for raw_channel_name in channel_datas: # Iterate over keys in channel_datas (only non-empty ones)
-                   channel_data = channel_datas[raw_channel_name]
-                   channel_properties_raw = extracted_info['all_channel_properties_raw'].get(raw_channel_name, {}) # Get properties by raw name
+              for raw_channel_name, channel_data in channel_datas.items(): # Only non-empty ones are in channel_datas
+                   channel_properties_raw = props_raw_all.get(raw_channel_name, {}) # Get properties by raw name
 
                    descriptive_name = raw_channel_name # Default name if type unknown
                    channel_type = channel_properties_raw.get('DAC~Channel~Type') # Use raw properties for type check
@@ -555,19 +801,15 @@ def extract_data_from_tdms(filepath, metadata, tdms_group_name, tdms_channel_nam
 
                    # Avoid duplicate descriptive names
                    if descriptive_name in processed_channel_names:
-                       descriptive_name = f"{descriptive_name}_{raw_channel_name.replace('/', '_').replace('~', '_')}"
+                       descriptive_name = f"{descriptive_name}_{raw_channel_name.translate(_TDMS_CHANNEL_SUFFIX)}"
 
-                   # Store the non-empty data under the descriptive name
-                   if channel_data.ndim == 1:
-                       channel_data = channel_data.reshape(-1, 1)
-                   elif channel_data.ndim > 2:
-                        print(f"  Warning: Processed channel '{raw_channel_name}' had unexpected dimension {channel_data.ndim}. Using flattened data.")
-                        channel_data = channel_data.flatten().reshape(-1, 1)
-
-                   extracted_info['sensor_values'][descriptive_name] = channel_data
+                   # Store the non-empty data under the descriptive name (already a C-contiguous (N, 1) column)
+                   sensor_values[descriptive_name] = channel_data
                    # Store properties under descriptive name for successfully extracted DATA channels
-                   extracted_info['channel_properties'][descriptive_name] = channel_properties_raw # Use the raw properties dictionary
-                   processed_channel_names.append(descriptive_name)
+                   channel_properties_by_name[descriptive_name] = channel_properties_raw # Use the raw properties dictionary
+                   if raw_channel_name in raw_channel_scaling:
+                        extracted_info.sensor_scaling[descriptive_name] = raw_channel_scaling[raw_channel_name]
+                   processed_channel_names.add(descriptive_name)
                    # print(f"  Stored data for '{descriptive_name}' (shape {channel_data.shape}).") # Uncomment for more detail
 
 
@@ -577,24 +819,25 @@ def extract_data_from_tdms(filepath, metadata, tdms_group_name, tdms_channel_nam
               # If timestamps were not available directly from time_track (which nptdms might provide automatically sometimes)
               # AND sample rate was found (from wf_increment) AND we have non-empty sensor data, generate timestamps
               # Note: nptdms might populate channel_obj.properties['wf_start_time'] etc. which time_track uses.
-              # If time_track() worked, extracted_info['timestamps'] would already be set by the default nptdms behavior.
+              # If time_track() worked, extracted_info.timestamps would already be set by the default nptdms behavior.
               # Since time_track failed in previous debug, we rely on explicit reconstruction from properties.
 
-              if extracted_info['sample_rate'] is not None and extracted_info['timestamps'] is None:
+              if extracted_info.sample_rate is not None and extracted_info.timestamps is None:
                   # Generate timestamps ONLY if we have successfully extracted NON-EMPTY sensor data
-                  if extracted_info['sensor_values'] and any(arr.size > 0 for arr in extracted_info['sensor_values'].values()):
-                      print("  Timestamps not found directly, but sample rate exists and non-empty sensor data was extracted. Attempting to generate time vector from sample rate and sensor data length.")
-                      # Get number of samples from the first extracted NON-EMPTY sensor array
-                      first_non_empty_sensor_name = next((name for name, arr in extracted_info['sensor_values'].items() if arr.size > 0), None)
+                  if extracted_info.sensor_values: # Only channels with non-empty data were stored above
+                      logger.debug("  Timestamps not found directly, but sample rate exists and non-empty sensor data was extracted. Attempting to generate time vector from sample rate and sensor data length.")
+                      # Get number of samples from the first extracted NON-EMPTY sensor array: the first one stored,
+                      # since channel_datas (and so sensor_values) only holds channels with non-empty data
+                      first_non_empty_sensor_name = next(iter(extracted_info.sensor_values), None)
                       if first_non_empty_sensor_name:
-                          num_samples = extracted_info['sensor_values'][first_non_empty_sensor_name].shape[0]
+                          num_samples = extracted_info.sensor_values[first_non_empty_sensor_name].shape[0]
 
                           # Try to get start_offset from the properties of one of the channels used for data (using its raw name)
                           start_offset = 0.0 # Default start time
                           # Find properties for the first channel whose data was successfully extracted (using raw name)
-                          if extracted_info['raw_channel_names']:
-                               first_raw_name_with_data = extracted_info['raw_channel_names'][0]
-                               raw_props_for_offset = extracted_info['all_channel_properties_raw'].get(first_raw_name_with_data, {})
+                          if extracted_info.raw_channel_names:
+                               first_raw_name_with_data = extracted_info.raw_channel_names[0]
+                               raw_props_for_offset = extracted_info.all_channel_properties_raw.get(first_raw_name_with_data, {})
                                # Use .get() with default 0.0 in case property is missing or None
                                start_offset = raw_props_for_offset.get('wf_start_offset', 0.0)
                                # Ensure start_offset is a number
@@ -603,43 +846,512 @@ def extract_data_from_tdms(filepath, metadata, tdms_group_name, tdms_channel_nam
 
 
                           if num_samples > 0:
-                               # Generate timestamps: start_offset + index * (1/sample_rate)
-                               extracted_info['timestamps'] = np.arange(num_samples) * (1.0 / extracted_info['sample_rate']) + start_offset
-                               print(f"  Generated timestamps from sample rate and properties (shape {extracted_info['timestamps'].shape}).")
+                               # Timestamps start_offset + index * (1/sample_rate), kept lazy like the .mat time axis;
+                               # the array is only built (in one np.linspace pass) by consumers that need all of it
+                               extracted_info.timestamps = TimeAxis(start_offset, 1.0 / extracted_info.sample_rate, num_samples)
+                               logger.debug("  Generated timestamps from sample rate and properties (shape %s).", extracted_info.timestamps.shape)
                           else:
-                               # This case should ideally not happen if extracted_info['sensor_values'] is not empty but size is 0
-                               print("  Warning: No non-empty sensor data length found to generate timestamps based on sample rate.")
+                               # This case should ideally not happen if extracted_info.sensor_values is not empty but size is 0
+                               logger.warning("  Warning: No non-empty sensor data length found to generate timestamps based on sample rate.")
                   # Else: no non-empty sensor values were extracted, so can't generate timestamps even with sample rate
 
 
               # Add sensor names list (using descriptive names) - only for non-empty data
-              extracted_info['sensor_names'] = [name for name, arr in extracted_info['sensor_values'].items() if arr.size > 0]
+              extracted_info.sensor_names = list(extracted_info.sensor_values) # All of them are non-empty, see above
 
 
           # The 'with TdmsFile.open(...) as tdms_file:' block ensures the file is closed
-          print(f"  Finished processing TDMS file. Non-empty sensor values extracted: {bool(extracted_info['sensor_values'])}.")
+          logger.debug("  Finished processing TDMS file. Non-empty sensor values extracted: %s.", bool(extracted_info.sensor_values))
           return extracted_info # Always return extracted_info if file was opened successfully
 
      except FileNotFoundError:
-         print(f"  Error: TDMS file not found at {filepath}")
-         extracted_info['extraction_error'] = "File not found."
+         logger.error("  Error: TDMS file not found at %s", filepath)
+         extracted_info.extraction_error = "File not found."
          return extracted_info # Return partial info even if file not found
      except Exception as e:
-         print(f"  An unexpected unhandled error occurred while processing {filepath}: {e}")
-         # import traceback; traceback.print_exc() # Uncomment for detailed error
-         extracted_info['extraction_error'] = f"Unhandled error: {e}"
+         logger.error("  An unexpected unhandled error occurred while processing %s: %s", filepath, e, exc_info=LOG_TRACEBACKS)
+         extracted_info.extraction_error = f"Unhandled error: {e}"
          return extracted_info # Return partial info even on unhandled error
 
 
+# --- HDF5 Layout of Signal Datasets ---
+# Signals and timestamps are written in chunks of up to 65536 rows, byte-shuffled and LZF-compressed. LZF is fast
+# enough not to slow the write down, the shuffle filter groups bytes of equal significance so float samples compress
+# better, and the chunks let readers load a window of samples without reading the whole dataset.
+_HDF5_CHUNK_ROWS = 1 << 16
+
+# Chunk cache of every HDF5 file opened for writing. The default 1 MiB is smaller than one chunk of a sensor matrix
+# with four or more float32 columns, so such chunks would bypass the cache; 64 MiB keeps the chunks being written
+# resident and flushes them in larger batches. rdcc_nslots is a prime well above the number of cached chunks, and
+# rdcc_w0=0.75 evicts fully written chunks first.
+_HDF5_WRITE_CACHE = {'rdcc_nbytes': 64 * 1024 * 1024, 'rdcc_nslots': 100003, 'rdcc_w0': 0.75}
+
+def _signal_dataset_options(shape):
+    """Returns the create_dataset() keyword arguments for a non-empty numeric array of the given shape."""
+    return {'chunks': (min(shape[0], _HDF5_CHUNK_ROWS),) + tuple(shape[1:]), 'compression': 'lzf', 'shuffle': True}
+
+# --- Sensor Matrix ---
+# When every saved sensor of a file is a single column of the same length and dtype (all channels of one
+# recording), they are stored together as one (samples, sensors) 'sensor_matrix' dataset with the sensor
+# names alongside in 'sensor_names', instead of one dataset per sensor. That is two HDF5 objects per file
+# instead of one per sensor, and readers load every sensor with a single read.
+_SENSOR_MATRIX = 'sensor_matrix'
+
+def _nonempty_sensors(sensor_values):
+    """Returns [(name, array), ...] for the sensors that have non-empty array data, in extraction order."""
+    return [(name, arr) for name, arr in sensor_values.items() if isinstance(arr, (np.ndarray, _PrecompressedSensor)) and arr.size > 0]
+
+def _stackable_sensors(nonempty_sensors):
+    """True if the (at least two) sensors are numeric single columns of one length and dtype, see _stack_sensors."""
+    if len(nonempty_sensors) < 2:
+        return False
+    first = nonempty_sensors[0][1]
+    return first.dtype.kind in 'fiub' and all(
+        arr.dtype == first.dtype and arr.shape[0] == first.shape[0] and arr.shape[1:] in ((), (1,))
+        for _, arr in nonempty_sensors)
+
+def _stack_sensors(nonempty_sensors):
+    """Returns the sensors as one (samples, sensors) array, columns in the order of nonempty_sensors."""
+    return np.column_stack([arr.reshape(-1) for _, arr in nonempty_sensors])
+
+
+# --- Pre-Compressed Sensor Chunks ---
+# The HDF5 file is written by the main process alone, so running the filter pipeline there serialises all the
+# compression work. Sensor arrays with at least one full chunk are instead shuffled and deflated in the worker
+# that extracted them, and the main process hands the finished chunks to HDF5 with write_direct_chunk().
+# LZF can't be produced from Python, so these datasets use the same shuffle+deflate (level 1) that the bytes
+# were compressed with; smaller arrays keep the LZF pipeline above.
+_DIRECT_CHUNK_OPTIONS = {'compression': 'gzip', 'compression_opts': 1, 'shuffle': True}
+
+def _compress_chunks(values):
+    """
+    Splits values into _HDF5_CHUNK_ROWS-row chunks and returns each one as HDF5 would store it with
+    shuffle+deflate: bytes grouped by significance, then zlib level 1. The last chunk is zero-padded
+    to the full chunk size, because HDF5 always stores edge chunks whole.
+    """
+    itemsize = values.dtype.itemsize
+    compressed = []
+    for start in range(0, values.shape[0], _HDF5_CHUNK_ROWS):
+        block = values[start:start + _HDF5_CHUNK_ROWS]
+        if block.shape[0] < _HDF5_CHUNK_ROWS:
+            padded = np.zeros((_HDF5_CHUNK_ROWS,) + values.shape[1:], dtype=values.dtype)
+            padded[:block.shape[0]] = block
+            block = padded
+        # Shuffle filter: byte 0 of every element, then byte 1, ...
+        shuffled = np.ascontiguousarray(block).view(np.uint8).reshape(-1, itemsize).T
+        compressed.append(zlib.compress(shuffled.tobytes(), 1))
+    return compressed
+
+def _precompress_sensor_values(sensor_values):
+    """
+    Returns {sensor name: chunks} for the datasets save_file_to_hdf5 will write that fill at least one chunk:
+    the _SENSOR_MATRIX when the sensors get stacked, otherwise the numeric 1D/2D arrays of the single sensors.
+    """
+    nonempty_sensors = _nonempty_sensors(sensor_values)
+    if _stackable_sensors(nonempty_sensors):
+        if nonempty_sensors[0][1].shape[0] < _HDF5_CHUNK_ROWS:
+            return {}
+        return {_SENSOR_MATRIX: _compress_chunks(_stack_sensors(nonempty_sensors))}
+    # Boolean sensors are saved converted to float (see save_file_to_hdf5), so chunks of the raw bytes would go unused
+    return {name: _compress_chunks(values) for name, values in nonempty_sensors
+            if values.dtype.kind in 'fiu' and values.ndim in (1, 2) and values.shape[0] >= _HDF5_CHUNK_ROWS}
+
+# The chunks replace the data of the arrays they were made from, so the worker only sends back the shape and dtype of
+# those arrays (everything save_file_to_hdf5 still reads from them); only the small LZF datasets travel as arrays.
+@dataclass(frozen=True, slots=True)
+class _PrecompressedSensor:
+    """Stand-in for a sensor array in sensor_values whose data is in compressed_chunks."""
+    shape: tuple
+    dtype: np.dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+def _strip_precompressed(sensor_values, compressed_chunks):
+    """Returns sensor_values with a _PrecompressedSensor in place of every array that compressed_chunks covers."""
+    if _SENSOR_MATRIX in compressed_chunks:
+        covered = {name for name, _ in _nonempty_sensors(sensor_values)} # The matrix is made of all non-empty sensors
+    else:
+        covered = compressed_chunks.keys()
+    return {name: _PrecompressedSensor(values.shape, values.dtype) if name in covered else values
+            for name, values in sensor_values.items()}
+
+def _write_precompressed(group, dataset_name, shape, dtype, compressed):
+    """Creates the dataset and writes its pre-compressed chunks directly, bypassing the filter pipeline."""
+    dataset = group.create_dataset(dataset_name, shape=shape, dtype=dtype,
+                                   chunks=(_HDF5_CHUNK_ROWS,) + tuple(shape[1:]), **_DIRECT_CHUNK_OPTIONS)
+    trailing_offset = (0,) * (len(shape) - 1)
+    for i, chunk_bytes in enumerate(compressed):
+        dataset.id.write_direct_chunk((i * _HDF5_CHUNK_ROWS,) + trailing_offset, chunk_bytes)
+    return dataset
+
+
+# --- HDF5-Safe Names ---
+# Translation tables for str.translate, built once here so each name is cleaned in a single pass
+# instead of a chain of .replace() calls. Characters mapped to None are removed.
+_HDF5_UNSAFE_CHARS = {c: '_' for c in ". -:<>~"}
+_HDF5_UNSAFE_CHARS.update({c: None for c in "[]'\""})
+# File group names: the path separator becomes a double underscore so the folder stays readable
+_HDF5_SAFE_GROUP = str.maketrans({**_HDF5_UNSAFE_CHARS, os.sep: '__'})
+# Dataset and sub-group names (sensor, channel and property names): any slash becomes an underscore
+_HDF5_SAFE_NAME = str.maketrans({**_HDF5_UNSAFE_CHARS, '/': '_', '\\': '_'})
+# Attribute keys only need the characters that show up in metadata keys
+_HDF5_SAFE_ATTR = str.maketrans({'.': '_', '~': '_', ' ': '_', '-': '_', ':': '_', '[': None, ']': None})
+
+def _safe_key(name, prefix, table=_HDF5_SAFE_NAME):
+    """
+    Cleans a name with one of the tables above and makes sure it starts with a letter or digit:
+    names that are empty or start with '_' (or another symbol) get the prefix, e.g. 'attr_'.
+    """
+    key = name.translate(table)
+    return key if key and key[0].isalnum() else prefix + key.lstrip('_')
+
+
+# --- Helper to Write a Batch of HDF5 Attributes ---
+def _attr_fallback_str(value):
+    """
+    The string saved in place of a value that can't be stored as an attribute as it is. Arrays and lists are
+    only summarised: str() would run numpy's pretty-printer over the whole array and give an attribute as large.
+    """
+    if isinstance(value, np.ndarray):
+        return f"<ndarray shape={value.shape} dtype={value.dtype}>"
+    if isinstance(value, (list, tuple)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return str(value)
+
+def _coerce_ndarray_attr(value):
+    """0-d arrays become their Python scalar, any other array the summary string."""
+    if value.ndim == 0 and np.isscalar(value.item()):
+        return value.item()
+    return _attr_fallback_str(value)
+
+# Values HDF5 attributes take as they are (isinstance also covers the numpy scalar types), checked first
+_ATTR_SIMPLE_TYPES = (str, int, float, bool, np.bool_, np.number)
+# Conversion of the other attribute values, looked up by their exact type; anything else goes to _attr_fallback_str
+_ATTR_COERCE = {
+    bytes: lambda value: value.decode('utf-8', errors='ignore'),
+    np.ndarray: _coerce_ndarray_attr,
+}
+
+def _attr_value(value):
+    """Returns value in a form HDF5 can store as an attribute: one isinstance check and one dict lookup."""
+    if isinstance(value, _ATTR_SIMPLE_TYPES):
+        return value
+    return _ATTR_COERCE.get(type(value), _attr_fallback_str)(value)
+
+def _update_attrs(attrs, pending, relative_filepath):
+    """
+    Writes the prepared {attribute_key: value} dict with a single attrs.update() call.
+    If a value is refused, the batch is retried one attribute at a time so the others are still saved:
+    a refused value is saved as its string (see _attr_fallback_str) instead, or skipped with a warning.
+    """
+    try:
+        attrs.update(pending)
+        return
+    except Exception:
+        pass # Retry one by one below
+    for key, value in pending.items():
+        try:
+            attrs[key] = value
+        except Exception as e:
+            # Fallback to string if attribute saving failed
+            try:
+                attrs[key] = _attr_fallback_str(value)
+            except Exception as e_str:
+                logger.warning("Warning: Could not save attribute '%s' for %s (value: %s, type: %s): %s / %s. Skipping attribute.", key, relative_filepath, _attr_fallback_str(value), type(value), e, e_str)
+
+
+# --- Function to Save the Result of One File to HDF5 ---
+# Called in the main loop for each result as it arrives, so the arrays of a file can be freed once written.
+def save_file_to_hdf5(h5file, relative_filepath, data):
+    """
+    Writes one ExtractionResult into its own group of the open HDF5 file: metadata and errors as attributes,
+    raw TDMS channel properties as sub-groups, sensor values and timestamps as datasets.
+    Problems with single items are printed and skipped so the rest of the file is still saved.
+    """
+    # Create a group for each file. Use relative path, but make it HDF5-safe.
+    # Replace / with __, . with _, and other potentially problematic characters (see _HDF5_SAFE_GROUP)
+    # and ensure it doesn't start with a reserved character (like _) or is empty
+    group_name = _safe_key(relative_filepath, 'file_', _HDF5_SAFE_GROUP)
+    # Ensure group name is not empty after cleaning
+    if not group_name:
+        logger.warning("Warning: Generated empty HDF5 group name for %s. Skipping save for this file.", relative_filepath)
+        return
+
+    try:
+        file_group = h5file.create_group(group_name)
+        # print(f"  Created group: {group_name}") # Optional debug
+    except Exception as e:
+         logger.error("Error creating HDF5 group for %s (name: %s): %s. Skipping save for this file.", relative_filepath, group_name, e)
+         return
+
+    # Store metadata as attributes on the group
+    if data.metadata:
+        meta_dict = data.metadata.copy()
+        # Remove 'filepath' from metadata before saving as attribute if you prefer relative paths
+        if 'filepath' in meta_dict: del meta_dict['filepath']
+        # Add relative path as an attribute if it wasn't in metadata originally
+        if 'relative_filepath' not in meta_dict:
+             meta_dict['relative_filepath_str'] = relative_filepath # Save as string attribute
+
+        # The whole dict is stored once as JSON; anything that isn't a plain scalar or string is only kept there
+        # (default=_attr_fallback_str covers numpy and other odd values), so there is no per-value type probing. Scalars and strings
+        # are also kept as typed attributes, since readers look them up directly (e.g. relative_filepath_str).
+        pending_attrs = {'metadata_json': json.dumps(meta_dict, default=_attr_fallback_str, ensure_ascii=False)}
+        for key, value in meta_dict.items():
+            if isinstance(value, bytes):
+                 value = value.decode('utf-8', errors='ignore')
+            if isinstance(value, str) and not value:
+                 continue # Empty strings are not written as attributes (they are still in metadata_json)
+            if isinstance(value, _ATTR_SIMPLE_TYPES):
+                 pending_attrs[_safe_key(key, 'attr_', _HDF5_SAFE_ATTR)] = value # HDF5-safe attribute key
+        _update_attrs(file_group.attrs, pending_attrs, relative_filepath)
+
+
+    # Store inferred type as attribute
+    if data.inferred_sensor_type:
+        try:
+            file_group.attrs['inferred_sensor_type'] = data.inferred_sensor_type
+        except Exception as e:
+             logger.warning("Warning: Could not save 'inferred_sensor_type' attribute for %s: %s", relative_filepath, e)
+
+    # Store extraction error/warning as attribute if present
+    if data.extraction_error is not None:
+        try:
+            file_group.attrs['extraction_error'] = data.extraction_error
+        except Exception as e: logger.warning("Warning: Could not save extraction_error attribute for %s: %s", relative_filepath, e)
+    if data.extraction_warning is not None:
+         try:
+             file_group.attrs['extraction_warning'] = data.extraction_warning
+         except Exception as e: logger.warning("Warning: Could not save extraction_warning attribute for %s: %s", relative_filepath, e)
+    if data.channel_read_errors: # Save TDMS channel read errors
+         try:
+              # Convert dict of errors to a list of strings or save as nested attributes/dataset?
+              # Saving as attributes on a sub-group seems best.
+              read_errors_group = file_group.create_group('channel_read_errors')
+              pending_attrs = {}
+              for chan_name, error_msg in data.channel_read_errors.items():
+                   # Save each error as an attribute named after the channel
+                   chan_name_safe = _safe_key(chan_name, 'chan_')
+                   pending_attrs[chan_name_safe] = str(error_msg)
+              _update_attrs(read_errors_group.attrs, pending_attrs, relative_filepath)
+         except Exception as e:
+              logger.warning("Warning: Could not create 'channel_read_errors' group for %s: %s", relative_filepath, e)
+
+
+    # Store properties for ALL configured channels found (TDMS only)
+    if data.all_channel_properties_raw:
+         props_group_raw = None
+         try:
+             # Create a group for all raw properties
+             props_group_raw = file_group.create_group('all_channel_properties_raw')
+         except Exception as e:
+              logger.warning("Warning: Could not create 'all_channel_properties_raw' group for %s: %s", relative_filepath, e)
+
+         if props_group_raw:
+             # Iterate through properties stored using the raw names
+             for raw_channel_name, props in data.all_channel_properties_raw.items():
+                  # Create a sub-group for properties of each channel (using raw name as group name)
+                  channel_prop_group_name_raw = _safe_key(raw_channel_name, 'raw_chan_')
+                  try:
+                      channel_prop_group_raw = props_group_raw.create_group(channel_prop_group_name_raw)
+                  except Exception as e:
+                       logger.warning("Warning: Could not create raw channel property group '%s' for channel '%s' in %s: %s. Skipping raw channel properties.", channel_prop_group_name_raw, raw_channel_name, relative_filepath, e)
+                       continue
+
+                  # Save each property as an attribute in the channel's sub-group, all of them in one batch
+                  pending_attrs = {}
+                  for p_key, p_value in props.items():
+                       p_key_safe = _safe_key(p_key, 'p_')
+
+                       # Simple types are saved as they are, bytes and numpy scalar arrays converted, anything else
+                       # summarised as a string (see _attr_value)
+                       try:
+                            p_value_to_save = _attr_value(p_value)
+                       except Exception:
+                            p_value_to_save = _attr_fallback_str(p_value) # Fallback to string if the value could not be converted
+
+                       # Queue the attribute; _update_attrs falls back to str() for values HDF5 refuses.
+                       # Empty values (TDMS files carry many empty property strings) are not written at all.
+                       if p_value_to_save is None or (isinstance(p_value_to_save, str) and not p_value_to_save):
+                            continue
+                       pending_attrs[p_key_safe] = p_value_to_save
+                  _update_attrs(channel_prop_group_raw.attrs, pending_attrs, relative_filepath)
+
+
+    # Store sensor values (each sensor with NON-EMPTY data as a dataset within a 'sensor_values' group, or all of them
+    # together in one 'sensor_matrix' dataset, see _stackable_sensors)
+    # The non-empty arrays are picked out once; they decide whether the group is created, what is saved and whether
+    # the timestamps are saved below
+    nonempty_sensors = _nonempty_sensors(data.sensor_values)
+    # Lets readers skip metadata-only groups from this attribute alone, without looking for 'sensor_values'
+    try:
+         file_group.attrs['has_sensor_data'] = bool(nonempty_sensors)
+    except Exception as e:
+         logger.warning("Warning: Could not save 'has_sensor_data' attribute for %s: %s", relative_filepath, e)
+    sensors_group = None
+    # Only create the group if there is at least one non-empty sensor array
+    if nonempty_sensors:
+         try:
+              sensors_group = file_group.create_group('sensor_values')
+              # print(f"  Created 'sensor_values' group.") # Optional debug
+         except Exception as e:
+              logger.error("Error creating sensor values group for %s: %s", relative_filepath, e)
+
+         if sensors_group and _stackable_sensors(nonempty_sensors):
+              sensor_names = [name for name, _ in nonempty_sensors]
+              try:
+                   if _SENSOR_MATRIX in data.compressed_chunks: # Chunks already compressed by the worker
+                        first_values = nonempty_sensors[0][1]
+                        dataset = _write_precompressed(sensors_group, _SENSOR_MATRIX, (first_values.shape[0], len(sensor_names)),
+                                                       first_values.dtype, data.compressed_chunks[_SENSOR_MATRIX])
+                   else:
+                        stacked = _stack_sensors(nonempty_sensors)
+                        dataset = sensors_group.create_dataset(_SENSOR_MATRIX, data=stacked, **_signal_dataset_options(stacked.shape))
+                   # Column i of the matrix is sensor_names[i]; the names are stored as values, so they are kept as they are
+                   sensors_group.create_dataset('sensor_names', data=np.array(sensor_names, dtype=h5py.string_dtype(encoding='utf-8')))
+                   if any(name in data.sensor_scaling for name in sensor_names):
+                        # One scale/offset per column (1 and 0 for columns that are already values)
+                        scaling = [data.sensor_scaling.get(name, (1.0, 0.0)) for name in sensor_names]
+                        dataset.attrs['scale'] = np.array([slope for slope, _ in scaling])
+                        dataset.attrs['offset'] = np.array([intercept for _, intercept in scaling])
+              except Exception as e:
+                   logger.error("Error saving the sensor matrix for %s (sensors %s): %s", relative_filepath, sensor_names, e)
+
+         elif sensors_group:
+              for sensor_name, values_array in nonempty_sensors: # Only non-empty data is saved
+                   # Ensure sensor name is a valid HDF5 dataset name
+                   dataset_name = _safe_key(sensor_name, 'sensor_') # Ensure not empty and doesn't start with invalid chars
+
+                   # Convert object arrays or non-numeric arrays to something savable (float or string)
+                   values_array_savable = None
+                   if values_array.dtype.hasobject:
+                        try:
+                            # Object arrays that only hold numbers are saved as a float dataset, converted in one C loop
+                            values_array_savable = values_array.astype(np.float64)
+                            logger.warning("Warning: Sensor '%s' in %s has object dtype. Converted to float for saving.", sensor_name, relative_filepath)
+                        except (TypeError, ValueError):
+                            logger.warning("Warning: Sensor '%s' in %s has object dtype. Attempting conversion to string for saving.", sensor_name, relative_filepath)
+                            try:
+                                # Flatten object array and convert each element to string (astype(str) runs str() in numpy's C loop)
+                                values_array_savable = values_array.astype(str).astype(h5py.string_dtype(encoding='utf-8')).flatten()
+                            except Exception as conv_e:
+                                 logger.error("Error converting object array for '%s' to string: %s. Skipping dataset.", sensor_name, conv_e)
+                                 continue # Skip this sensor dataset
+                   elif not np.issubdtype(values_array.dtype, np.number):
+                        logger.warning("Warning: Sensor '%s' in %s has non-numeric dtype %s. Attempting conversion to float.", sensor_name, relative_filepath, values_array.dtype)
+                        try:
+                             values_array_savable = values_array.astype(float)
+                        except Exception as conv_e:
+                             logger.error("Error converting non-numeric array for '%s' to float: %s. Skipping dataset.", sensor_name, conv_e)
+                             continue
+                   else:
+                       values_array_savable = values_array # Data is already numeric and standard
+
+                   # Ensure data is 1D or 2D for consistency in HDF5 datasets
+                   if values_array_savable is not None:
+                       if values_array_savable.ndim == 0: # Handle scalar? Make it 1D
+                            values_array_savable = np.array([values_array_savable])
+                       elif values_array_savable.ndim > 2: # Flatten >2D
+                            logger.warning("Warning: Dataset '%s' from '%s' in %s has >2D shape %s. Flattening to 1D.", dataset_name, sensor_name, relative_filepath, values_array_savable.shape)
+                            values_array_savable = values_array_savable.flatten()
+
+                   if values_array_savable is not None:
+                        try:
+                             # h5py dataset names cannot start with '.'
+                             if dataset_name.startswith('.'): dataset_name = '_' + dataset_name
+                             if sensor_name in data.compressed_chunks and values_array_savable is values_array:
+                                  # Chunks already compressed by the worker
+                                  dataset = _write_precompressed(sensors_group, dataset_name, values_array.shape, values_array.dtype, data.compressed_chunks[sensor_name])
+                             elif values_array_savable.dtype.kind in 'fiub':
+                                  dataset = sensors_group.create_dataset(dataset_name, data=values_array_savable, **_signal_dataset_options(values_array_savable.shape))
+                             else: # Strings converted from object arrays keep plain gzip
+                                  dataset = sensors_group.create_dataset(dataset_name, data=values_array_savable, compression="gzip") # Add compression
+                             if sensor_name in data.sensor_scaling:
+                                  # Raw integer counts: readers get the values with raw.astype(np.float32) * scale + offset
+                                  dataset.attrs['scale'], dataset.attrs['offset'] = data.sensor_scaling[sensor_name]
+                             # print(f"  Saved dataset '{dataset_name}' (shape {values_array_savable.shape}).") # Optional debug
+                        except Exception as e:
+                             logger.error("Error saving dataset '%s' for sensor '%s' in %s: %s. Skipping dataset.", dataset_name, sensor_name, relative_filepath, e)
+
+         # else:
+         #      print(f"  No non-empty sensor values to save for {relative_filepath}.") # Optional debug message
+
+
+    # Store timestamps if available (only if there was at least one non-empty sensor data array saved)
+    if data.timestamps is not None and nonempty_sensors:
+    # Check if timestamps exist AND there is non-empty sensor data (also when the sensors_group creation failed)
+         try:
+              # Ensure timestamps are numeric and 1D before saving
+              if isinstance(data.timestamps, TimeAxis):
+                  # Evenly spaced timestamps are not written out at all, only the axis: readers rebuild them as
+                  # np.linspace(start, start + (count - 1) * increment, count) in timestamps_dtype (see TimeAxis.storage_dtype)
+                  file_group.attrs.update({'timestamps_start': float(data.timestamps.start),
+                                           'timestamps_increment': float(data.timestamps.inc),
+                                           'timestamps_count': int(data.timestamps.n),
+                                           'timestamps_dtype': data.timestamps.storage_dtype().name})
+              elif isinstance(data.timestamps, np.ndarray) and data.timestamps.dtype.kind in 'fiu':
+                  timestamps_to_save = data.timestamps.flatten()
+                  # Save timestamps dataset at the file group level
+                  file_group.create_dataset('timestamps', data=timestamps_to_save, **_signal_dataset_options(timestamps_to_save.shape))
+                  # print(f"  Saved timestamps.") # Optional debug
+              else:
+                   logger.warning("Warning: Timestamps for %s are not a numeric numpy array (%s %s). Skipping save.", relative_filepath, type(data.timestamps), getattr(data.timestamps, 'dtype', 'N/A'))
+
+         except Exception as e:
+              logger.error("Error saving timestamps for %s: %s", relative_filepath, e, exc_info=LOG_TRACEBACKS)
+
+    # Store sample rate as attribute if available (regardless of data presence, if extracted)
+    if data.sample_rate is not None:
+         try:
+              file_group.attrs['sample_rate'] = float(data.sample_rate) # Ensure it's a float
+              # print(f"  Saved sample rate ({data.sample_rate:.2f} Hz).") # Optional debug
+         except Exception as e:
+              logger.error("Error saving sample rate attribute for %s: %s", relative_filepath, e, exc_info=LOG_TRACEBACKS)
+
+
 # --- Configuration ---
 # Replace with the path to the root folder of your dataset.
 # Example: BASE_DATASET_DIRECTORY = '/path/to/your/downloaded/ztmf3m7h5x/'
 BASE_DATASET_DIRECTORY = '/home/dangtuan/projects/multiagent-maintenance/project_dataset' # <<< --- UPDATE THIS PATH ---
 
+# Cache the raw signal of each .mat file in a '<file>.mat.h5' sidecar next to it and read that on later runs.
+# Set to False if the dataset directory is read-only or you don't want extra files in it.
+USE_MAT_H5_SIDECARS = True
+
+# Run with --strict to spot-check that timestamps are evenly spaced wherever the sample rate is derived
+# from them. Only a random sample of gaps is compared, so the check stays cheap on long signals.
+STRICT_TIMESTAMP_CHECKS = '--strict' in sys.argv
+
+# Run with --debug to also log the traceback of unexpected errors (on top of every extraction step, see the logging setup)
+LOG_TRACEBACKS = '--debug' in sys.argv
+
+# Per-file results, warnings and errors are written here (overwritten on every run); the console only gets the summary
+EXTRACTION_LOG_PATH = 'extract.log'
+
+# The combined output file (h5_to_csv.py and read_file_h5.py read it from the same place)
+HDF5_OUTPUT_PATH = 'extracted_dataset_structured.h5'
+
+# Each worker writes the group of every file it extracts into its own '<job index>_<group name>.h5' file in this folder, and
+# HDF5_OUTPUT_PATH only gets an external link to each of them, so the HDF5 writing runs in parallel instead of in
+# the main process. The links are relative: keep the folder next to the output file when moving it.
+# Set to None to write everything into the single, self-contained output file from the main process.
+# The data is the same either way, but the filters differ: the workers write the part files through h5py's filter
+# pipeline (shuffle+LZF, see _signal_dataset_options), while the single file gets the large datasets as chunks
+# compressed in the workers with shuffle+deflate level 1 (see _precompress_sensor_values), as LZF can't be produced
+# from Python. Readers that decode HDF5 filters themselves need both.
+HDF5_PARTS_DIRECTORY = 'extracted_dataset_structured_parts'
+
 # --- IMPORTANT for TDMS files (Temperature, Motor Current) ---
 # Based on your inspection output, the group is 'Log' and channels are cDAQ names.
 TDMS_GROUP_NAME = 'Log'
-TDMS_CHANNEL_NAMES = [
+# A frozenset: extract_data_from_tdms only tests channel names for membership, once per channel in every file
+TDMS_CHANNEL_NAMES = frozenset([
     'cDAQ9185-1F486B5Mod1/ai0', # Based on inspection, likely Temperature 1
     'cDAQ9185-1F486B5Mod1/ai1', # Based on inspection, likely Temperature 2
     'cDAQ9185-1F486B5Mod2/ai0', # Based on inspection, likely Current 1
@@ -649,551 +1361,455 @@ TDMS_CHANNEL_NAMES = [
     # If you need more, inspect a TDMS file and add them here if they are under 'Log'.
     # NOTE: You might need to add more channel names here if other TDMS files use different cDAQ modules or channels!
     # Based on your TDMS output, these seem to be the only relevant channels used across the dataset for temp/current.
-]
+])
+
+# Whether TDMS files can be extracted at all is the same for every file, so it is decided once here:
+# the reason they are skipped in this run, or None if they can be extracted
+if TDMS_GROUP_NAME == 'REPLACE_WITH_ACTUAL_TDMS_GROUP_NAME':
+    _TDMS_SKIP_REASON = 'TDMS GROUP NAME NOT CONFIGURED'
+elif not _NPTDMS_AVAILABLE:
+    _TDMS_SKIP_REASON = 'nptdms library not available'
+else:
+    _TDMS_SKIP_REASON = None
 
-# Dictionary to store extracted data for all files that returned an extracted_info dictionary (Success with Data or Metadata Only)
-all_extracted_info = {}
+# --- Helper to Buffer the Output of One Job ---
+class _JobOutputHandler(logging.StreamHandler):
+    """StreamHandler that also remembers the most severe level it has written (max_level)."""
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.max_level = logging.NOTSET
 
-# Lists to store relative paths based on final processing outcome categories
-processed_with_data_files = []
-processed_metadata_only_files = []
-skipped_initial_files = [] # Files that didn't match the parse_filename regex or were hidden/system
+    def emit(self, record):
+        self.max_level = max(self.max_level, record.levelno)
+        super().emit(record)
 
-print(f"Starting data extraction from base directory: {BASE_DATASET_DIRECTORY}")
+@contextlib.contextmanager
+def _capture_job_output():
+    """
+    Redirects stdout and the module logger into one StringIO buffer while a job runs.
+    Yields (buffer, handler); handler.max_level tells the main process at which level to log the buffered text.
+    """
+    output = io.StringIO()
+    log_handler = _JobOutputHandler(output)
+    log_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(log_handler)
+    logger.propagate = False # Records go to the buffer only, not to the root handlers as well
+    try:
+        with contextlib.redirect_stdout(output):
+            yield output, log_handler
+    finally:
+        logger.removeHandler(log_handler)
+        logger.propagate = True
 
-total_files_in_directory = 0
-relevant_files_attempted = 0 # Files matching parse_filename
+def _init_worker(log_level):
+    """
+    Pool initializer: gives the module logger of a worker the level of the main process. With the 'spawn' start method
+    (default on macOS and Windows) workers re-import this module and would otherwise log at the default level.
+    """
+    logger.setLevel(log_level)
 
-# --- Main Extraction Loop - Iterate through subdirectories ---
-for root, _, files in os.walk(BASE_DATASET_DIRECTORY):
-    for filename in files:
-        total_files_in_directory += 1
-        filepath = os.path.join(root, filename)
-        relative_filepath = os.path.relpath(filepath, BASE_DATASET_DIRECTORY)
 
-        # Skip hidden files or system files
-        if filename.startswith('.') or filename.endswith(':Zone.Identifier'):
-            # print(f"Skipping hidden/system file: {relative_filepath}") # Optional debug
-            skipped_initial_files.append(relative_filepath)
-            continue
+# --- Directory Traversal ---
+def iter_files(root):
+    """
+    Recursively yields an os.DirEntry for every file below root.
+    os.scandir hands back the name and file type with each entry, so no extra stat() call or
+    os.path.join is needed per file. Symlinked folders are not followed (like os.walk).
+    """
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path)
+            elif entry.is_file():
+                yield entry
 
-        # --- TEMPORARY DEBUG FILTER: Process only one specific file at a time for debugging ---
-        # UNCOMMENT the following lines and REPLACE the path with the SPECIFIC file
-        # you want to debug (e.g., one failed .mat or one failed .tdms)
-        # After debugging, COMMENT these lines out again to process all files.
 
-        # target_debug_file = 'acoustic/0Nm_BPFI_03.mat' # <-- REPLACE WITH YOUR DEBUG FILE PATH
-        #
-        # if relative_filepath != target_debug_file:
-        #      # Optional: print that we are skipping this file
-        #      # print(f"   --> Skipping {relative_filepath} (not target debug file)")
-        #      continue # Skip this file if it's not the one we want to debug
-        #
-        # # If we reach here, it means relative_filepath == target_debug_file
-        # print(f"\n--- DEBUG MODE: Found target file, processing: {relative_filepath} ---")
-        # --- END TEMPORARY DEBUG FILTER ---
+# --- Helper to Write One File's Group into Its Own HDF5 File (runs in the workers) ---
+def _write_hdf5_part(job_index, relative_filepath, extracted_info):
+    """
+    Saves extracted_info with save_file_to_hdf5 into '<job index>_<group name>.h5' in HDF5_PARTS_DIRECTORY, under the
+    same group name it gets in the combined file. Returns the path of the part file, or None if it could not be written.
+    The job index keeps the part files apart when two files get the same HDF5-safe group name (e.g. 'BPFO-10.mat' and
+    'BPFO_10.mat'); the main process then links only the first one and reports the other.
+    """
+    part_path = os.path.join(HDF5_PARTS_DIRECTORY, f"{job_index:05d}_{_safe_key(relative_filepath, 'file_', _HDF5_SAFE_GROUP)}.h5")
+    try:
+        with h5py.File(part_path, 'w', libver='latest', **_HDF5_WRITE_CACHE) as part_file:
+             save_file_to_hdf5(part_file, relative_filepath, extracted_info)
+    except Exception as e:
+         logger.error("Error saving data for %s to %s: %s", relative_filepath, part_path, e)
+         return None
+    return part_path
 
 
+# --- Worker Function: Parse and Extract a Single File ---
+# Runs in a worker process of the pool below. It must stay a top-level function so it can be pickled.
+def process_one(job):
+    """
+    Parses the filename of one file and runs the matching extractor on it.
+    Everything printed or logged while processing is buffered and returned with the result, so the main
+    process can emit each file's output in one piece instead of interleaving workers.
+    Returns (relative_filepath, metadata, extracted_info, output, output_level). metadata is None for files
+    that don't match the expected filename pattern; output_level is the most severe level logged in output.
+    """
+    job_index, filepath, relative_filepath = job
+    filename = os.path.basename(filepath)
+
+    with _capture_job_output() as (output, output_handler):
         metadata = parse_filename(filename, filepath)
 
-        # Check if file matches the pattern and is one of the relevant extensions
-        if metadata is None or metadata.get('extension') not in ['mat', 'tdms']:
+        # Check if file matches the pattern. The extension was already checked when the jobs were collected,
+        # and parse_filename only accepts .mat/.tdms names.
+        assert metadata is None or metadata['extension'] in ('mat', 'tdms')
+        if metadata is None:
              # print(f"Skipping {relative_filepath}: Does not match expected filename pattern or extension.") # Optional: uncomment to see files skipped by parse_filename
-             skipped_initial_files.append(relative_filepath) # Add to skipped list
-             continue
+             return relative_filepath, None, None, output.getvalue(), output_handler.max_level
 
         # --- File is relevant, attempt extraction ---
-        relevant_files_attempted += 1
-        print(f"\nProcessing relevant file {relevant_files_attempted}: {relative_filepath}")
-
         extracted_info = None
-        extraction_successful = False # Flag if the extraction function returned a non-None dictionary
+        extraction_successful = False # Flag if the extraction function returned a non-None ExtractionResult
 
         if metadata['extension'] == 'mat':
              try:
                  extracted_info = extract_data_from_mat(filepath, metadata)
-                 if extracted_info is not None: # Function returned a dictionary
+                 if extracted_info is not None: # Function returned an ExtractionResult
                      extraction_successful = True
              except Exception as e:
                   # This should ideally be caught within the function, but as a safety net
-                  print(f"  An unhandled exception occurred during MAT processing for {filename}: {e}")
-                  # import traceback; traceback.print_exc()
-                  extracted_info = {'metadata': metadata, 'extraction_error': f'Unhandled exception during MAT processing: {e}'}
-                  extraction_successful = True # We have an info dict, even if it signals an error
+                  logger.error("  An unhandled exception occurred during MAT processing for %s: %s", filename, e, exc_info=LOG_TRACEBACKS)
+                  extracted_info = ExtractionResult(metadata, extraction_error=f'Unhandled exception during MAT processing: {e}')
+                  extraction_successful = True # We have a result, even if it signals an error
 
 
         elif metadata['extension'] == 'tdms':
-             # Ensure TDMS group name is configured before processing TDMS files
-             if TDMS_GROUP_NAME == 'REPLACE_WITH_ACTUAL_TDMS_GROUP_NAME':
-                 print(f"  TDMS GROUP NAME NOT UPDATED IN CONFIGURATION! Skipping extraction for {relative_filepath}.")
-                 extracted_info = {'metadata': metadata, 'extraction_error': 'TDMS GROUP NAME NOT CONFIGURED'}
-                 extraction_successful = True # We have an info dict for reporting
+             # Group name not configured or nptdms missing (decided once at startup, see _TDMS_SKIP_REASON)
+             if _TDMS_SKIP_REASON is not None:
+                 logger.error("  Skipping extraction for %s: %s.", relative_filepath, _TDMS_SKIP_REASON)
+                 extracted_info = ExtractionResult(metadata, extraction_error=_TDMS_SKIP_REASON)
+                 extraction_successful = True # We have a result for reporting
              else:
                 try:
-                     # Ensure nptdms is installed if processing TDMS
-                     if 'nptdms' not in sys.modules: # Check if the module was successfully imported
-                          print("  Skipping TDMS file: nptdms library not installed or failed to import.")
-                          extracted_info = {'metadata': metadata, 'extraction_error': 'nptdms library not available'}
-                          extraction_successful = True # We have an info dict for reporting
-                     else: # Only attempt extraction if nptdms is available
-                         extracted_info = extract_data_from_tdms(filepath, metadata, TDMS_GROUP_NAME, TDMS_CHANNEL_NAMES)
-                         if extracted_info is not None: # Function returned a dictionary
-                            extraction_successful = True
+                     extracted_info = extract_data_from_tdms(filepath, metadata, TDMS_GROUP_NAME, TDMS_CHANNEL_NAMES)
+                     if extracted_info is not None: # Function returned an ExtractionResult
+                        extraction_successful = True
 
 
                 except Exception as e:
                      # This should ideally be caught within the function, but as a safety net
-                     print(f"  An unhandled exception occurred during TDMS processing for {filename}: {e}")
-                     # import traceback; traceback.print_exc() # Uncomment for detailed error
-                     extracted_info = {'metadata': metadata, 'extraction_error': f'Unhandled exception during TDMS processing: {e}'}
-                     extraction_successful = True # We have an info dict for reporting
+                     logger.error("  An unhandled exception occurred during TDMS processing for %s: %s", filename, e, exc_info=LOG_TRACEBACKS)
+                     extracted_info = ExtractionResult(metadata, extraction_error=f'Unhandled exception during TDMS processing: {e}')
+                     extraction_successful = True # We have a result for reporting
 
-
-        # --- Process the result from extraction function ---
         if extracted_info is not None:
-            # The extraction function returned a dictionary (success or contained error info)
-            all_extracted_info[relative_filepath] = extracted_info # Store the info dictionary
-
-            # Check if the info dict contains non-empty sensor data
-            if extracted_info.get('sensor_values') and any(isinstance(arr, np.ndarray) and arr.size > 0 for arr in extracted_info['sensor_values'].values()):
-                 # Contains at least one non-empty sensor data array
-                 processed_with_data_files.append(relative_filepath)
-                 print(f"    Result: Processed with Data.")
-                 print(f"    Inferred Sensor Type: {extracted_info.get('inferred_sensor_type', 'N/A')}")
-                 # Use the sensor_names list which only includes names with non-empty data now
-                 print(f"    Extracted Sensors: {extracted_info.get('sensor_names', 'N/A')} (Non-empty data)")
-                 # Get number of samples from the first extracted NON-EMPTY sensor array
-                 first_non_empty_sensor_name = next((name for name, arr in extracted_info['sensor_values'].items() if isinstance(arr, np.ndarray) and arr.size > 0), None)
-                 if first_non_empty_sensor_name:
-                     num_samples = extracted_info['sensor_values'][first_non_empty_sensor_name].shape[0]
-                     print(f"    Number of Samples (first non-empty): {num_samples}")
-                 else:
-                     print("    Number of Samples: N/A (Logic error, should have non-empty data)") # Should not happen here
-
-                 print(f"    Sample Rate: {extracted_info.get('sample_rate', 'Not found')} Hz")
-                 print(f"    Timestamps extracted/generated: {'timestamps' in extracted_info and extracted_info['timestamps'] is not None}")
+             if extracted_info.sensor_names:
+                  extracted_info.num_samples = extracted_info.sensor_values[extracted_info.sensor_names[0]].shape[0]
+             if HDF5_PARTS_DIRECTORY is not None:
+                  # The group is written here, in parallel with the other workers; the main process only links it
+                  extracted_info.hdf5_part = _write_hdf5_part(job_index, relative_filepath, extracted_info)
+                  if extracted_info.hdf5_part is not None and extracted_info.sensor_names:
+                       # The arrays are in the part file now, so they are not pickled back through the pool; the main
+                       # process only needs sensor_names and num_samples. (Metadata-only results only hold empty arrays.)
+                       extracted_info.sensor_values = {}
+             else:
+                  # Compress the large sensor arrays here, in parallel, rather than in the single writing process
+                  extracted_info.compressed_chunks = _precompress_sensor_values(extracted_info.sensor_values)
+                  extracted_info.sensor_values = _strip_precompressed(extracted_info.sensor_values, extracted_info.compressed_chunks)
+
+    # The file is done; its loadmat results would never be looked up again in this worker
+    _load_mat_cached.cache_clear()
+
+    return relative_filepath, metadata, extracted_info, output.getvalue(), output_handler.max_level
+
+
+# The driver below only runs when the script is executed directly, so worker processes
+# that import this module (e.g. with the 'spawn' start method) don't re-run the extraction.
+if __name__ == '__main__':
+    # Per-file results and problems go to the log file instead of the console; only the summary below is printed.
+    # The file is opened on the first record (delay=True). --quiet keeps only warnings and errors, --debug adds every
+    # extraction step. Both only change the level of this module's logger, so h5py/nptdms debug output stays quiet.
+    logging.basicConfig(level=logging.INFO, format='%(message)s',
+                        handlers=[logging.FileHandler(EXTRACTION_LOG_PATH, mode='w', delay=True)])
+    logger.setLevel(logging.DEBUG if '--debug' in sys.argv else logging.WARNING if '--quiet' in sys.argv else logging.NOTSET)
+
+    # Lists to store relative paths based on final processing outcome categories
+    processed_with_data_files = []
+    processed_metadata_only_files = []
+    skipped_initial_files = [] # Files that didn't match the parse_filename regex or were hidden/system
+
+    print(f"Starting data extraction from base directory: {BASE_DATASET_DIRECTORY}")
+    print(f"Per-file results are logged to {EXTRACTION_LOG_PATH}")
+    if _TDMS_SKIP_REASON is not None:
+         # Reported once here; the .tdms files are still listed, with this reason as their extraction error
+         print(f"Warning: .tdms files will not be extracted in this run: {_TDMS_SKIP_REASON}.")
+
+    total_files_in_directory = 0
+    relevant_files_attempted = 0 # Files matching parse_filename
+
+    # --- Collect Jobs - Iterate through subdirectories ---
+    jobs = [] # (job index, filepath, relative_filepath) for every file handed to the worker pool
+    for entry in iter_files(BASE_DATASET_DIRECTORY):
+        filename = entry.name
+        filename_lower = filename.lower()
+        # Sidecars written by extract_data_from_mat are our own cache files, not part of the dataset
+        if filename_lower.endswith('.mat' + _MAT_SIDECAR_SUFFIX):
+            continue
+        total_files_in_directory += 1
+        filepath = entry.path # Already joined by os.scandir
+        relative_filepath = os.path.relpath(filepath, BASE_DATASET_DIRECTORY)
 
-            else:
-                 # Returned info, but no non-empty sensor data was found/extracted (includes cases where function reported an error/warning)
-                 processed_metadata_only_files.append(relative_filepath)
-                 print(f"    Result: Processed (Metadata Only).")
-                 print(f"    Inferred Sensor Type: {extracted_info.get('inferred_sensor_type', 'N/A')}")
-                 # List sensors that were found, even if empty data
-                 all_found_sensor_names = list(extracted_info.get('sensor_values', {}).keys())
-                 print(f"    Extracted Sensors (found, but data was empty or unreadable): {all_found_sensor_names}")
-                 print(f"    Sample Rate (hint): {extracted_info.get('sample_rate', 'Not found')} Hz")
-                 # Optional: print specific extraction error/warning from the info dict
-                 if 'extraction_error' in extracted_info:
-                     print(f"    Extraction Error/Reason: {extracted_info['extraction_error']}")
-                 elif 'extraction_warning' in extracted_info:
-                     print(f"    Extraction Warning: {extracted_info['extraction_warning']}")
+        # Skip hidden files or system files
+        if filename.startswith('.') or filename.endswith(':Zone.Identifier'):
+            # print(f"Skipping hidden/system file: {relative_filepath}") # Optional debug
+            skipped_initial_files.append(relative_filepath)
+            continue
 
-        else:
-            # This case should be rare with the updated functions returning dictionaries,
-            # but it handles scenarios where the extraction function itself returned None.
-            # This would typically indicate a critical failure within the function itself.
-            print(f"    Result: Extraction Function Returned None (Critical Failure).")
-            # These files are not added to all_extracted_info, so they aren't included
-            # in processed_with_data_files or processed_metadata_only_files.
-            # They are implicitly accounted for by `relevant_files_attempted` minus
-            # the sum of the other two lists.
-
-# --- Final Summary ---
-print(f"\n--- Processing Summary ---")
-print(f"Total files found in base directory: {total_files_in_directory}")
-print(f"Files skipped initially (hidden/system or pattern mismatch): {len(skipped_initial_files)}")
-print(f"Files matching expected pattern (.mat/.tdms) and attempted: {relevant_files_attempted}")
-print(f"  Processed successfully (with non-empty data): {len(processed_with_data_files)}")
-print(f"  Processed (metadata/properties only, no non-empty data): {len(processed_metadata_only_files)}")
-# Calculate files where extraction function returned None
-files_returning_none = relevant_files_attempted - len(processed_with_data_files) - len(processed_metadata_only_files)
-print(f"  Extraction function returned None (critical failure): {files_returning_none}") # This count should ideally be 0
-
-print(f"--------------------------")
-
-# Verification checks
-total_categorized_at_start = len(skipped_initial_files) + relevant_files_attempted
-print(f"Check: Total files found ({total_files_in_directory}) == Sum of initial parse outcomes ({total_categorized_at_start})")
-if total_files_in_directory == total_categorized_at_start:
-     print("Check successful.")
-else:
-     print("Check failed: Sum of initial outcomes ({total_categorized_at_start}) does not match total files found ({total_files_in_directory}).")
+        # Only .mat and .tdms files can match parse_filename; skip everything else here without
+        # sending it to a worker (same case-insensitive check as the filename pattern)
+        if not filename_lower.endswith(('.mat', '.tdms')):
+            skipped_initial_files.append(relative_filepath)
+            continue
 
-total_relevant_outcomes = len(processed_with_data_files) + len(processed_metadata_only_files) + files_returning_none
-print(f"Check: Relevant files attempted ({relevant_files_attempted}) == Sum of processing outcomes ({total_relevant_outcomes})")
-if relevant_files_attempted == total_relevant_outcomes:
-    print("Check successful.")
-else:
-    print("Check failed: Sum of outcomes ({total_relevant_outcomes}) does not match attempted files ({relevant_files_attempted}).")
+        # --- TEMPORARY DEBUG FILTER: Process only one specific file at a time for debugging ---
+        # UNCOMMENT the following lines and REPLACE the path with the SPECIFIC file
+        # you want to debug (e.g., one failed .mat or one failed .tdms)
+        # After debugging, COMMENT these lines out again to process all files.
 
+        # target_debug_file = 'acoustic/0Nm_BPFI_03.mat' # <-- REPLACE WITH YOUR DEBUG FILE PATH
+        #
+        # if relative_filepath != target_debug_file:
+        #      # Optional: print that we are skipping this file
+        #      # print(f"   --> Skipping {relative_filepath} (not target debug file)")
+        #      continue # Skip this file if it's not the one we want to debug
+        #
+        # # If we reach here, it means relative_filepath == target_debug_file
+        # print(f"\n--- DEBUG MODE: Found target file, processing: {relative_filepath} ---")
+        # --- END TEMPORARY DEBUG FILTER ---
 
-# --- Print lists of file outcomes ---
-print("\n--- Danh sách các tệp đã trích xuất ĐẦY ĐỦ DỮ LIỆU ---")
-if processed_with_data_files:
-    for i, filepath in enumerate(sorted(processed_with_data_files)):
-        print(f"{i + 1}. {filepath}")
-else:
-    print("Không có tệp nào được trích xuất đầy đủ dữ liệu cảm biến.")
+        jobs.append((len(jobs), filepath, relative_filepath))
+
+    # --- Saving the Extracted Data ---
+    # Each result is written to HDF5 as soon as it comes back instead of collecting all of them for one write
+    # at the end, so only a few files' arrays are in memory at a time instead of the whole dataset.
+    hdf5_output_path = HDF5_OUTPUT_PATH
+    if HDF5_PARTS_DIRECTORY is not None:
+        # Part files of an earlier run are replaced, just like the output file itself
+        os.makedirs(HDF5_PARTS_DIRECTORY, exist_ok=True)
+        for stale_part in os.scandir(HDF5_PARTS_DIRECTORY):
+             if stale_part.name.endswith('.h5') and stale_part.is_file():
+                  os.remove(stale_part.path)
+        # External link targets are stored relative to the folder of the output file
+        hdf5_parts_link_directory = os.path.relpath(HDF5_PARTS_DIRECTORY, os.path.dirname(os.path.abspath(hdf5_output_path)))
+    try:
+        # libver='latest': groups with many attributes (metadata, raw TDMS channel properties) use dense attribute
+        # storage instead of rewriting the object header on every attribute write. Needs HDF5 1.10+ to read.
+        h5file = h5py.File(hdf5_output_path, 'w', libver='latest', **_HDF5_WRITE_CACHE)
+        print(f"Saving extracted data structure to {hdf5_output_path} while processing...")
+        if HDF5_PARTS_DIRECTORY is not None:
+             print(f"  (file groups are written by the workers into {HDF5_PARTS_DIRECTORY} and linked from there)")
+    except Exception as e:
+        h5file = None
+        print(f"\nError opening {hdf5_output_path} for writing: {e}. Extracted data will not be saved.")
+
+    # --- Main Extraction Loop - Files are parsed and extracted in parallel worker processes ---
+    # Results are handled as soon as any worker finishes, so one large file doesn't hold back the files queued
+    # behind it. Each file's output is still printed in one piece; the file lists in the summary are sorted.
+    # The effective level, so the INFO default set through basicConfig above also holds in workers without it
+    with multiprocessing.Pool(processes=os.cpu_count(), initializer=_init_worker, initargs=(logger.getEffectiveLevel(),)) as pool, (h5file if h5file is not None else contextlib.nullcontext()):
+        for relative_filepath, metadata, extracted_info, output, output_level in pool.imap_unordered(process_one, jobs, chunksize=8):
+            if metadata is None:
+                 skipped_initial_files.append(relative_filepath) # Add to skipped list
+                 continue
 
-print("\n--- Danh sách các tệp đã trích xuất CHỈ METADATA/PROPERTIES (Không có dữ liệu tín hiệu non-empty) ---")
-if processed_metadata_only_files:
-    for i, filepath in enumerate(sorted(processed_metadata_only_files)):
-        print(f"{i + 1}. {filepath}")
-else:
-    print("Không có tệp nào được trích xuất chỉ metadata/properties.")
-
-print("\n--- Danh sách các tệp KHÔNG THỂ XỬ LÝ HOẶC BỊ BỎ QUA BAN ĐẦU ---")
-# This list combines files skipped initially and files where the extraction function returned None.
-# The summary counters give the breakdown. This list just provides the paths for initially skipped files.
-print("\n--- Files skipped initially (hidden/system or pattern mismatch) ---")
-if skipped_initial_files:
-     for i, filepath in enumerate(sorted(skipped_initial_files)):
-          print(f"{i+1}. {filepath}")
-else:
-     print("Không có tệp nào bị bỏ qua ban đầu.")
-
-if files_returning_none > 0:
-    print(f"\n--- Files where extraction function returned NONE (critical failure) ---")
-    print(f"({files_returning_none} files - details were printed above during processing)")
-    # We don't have a specific list of paths for these easily here without storing them earlier.
-    # The printed output during processing should give details for these.
-
-
-# --- How to access the extracted data (Example - Uncomment to use) ---
-# print("\n--- Sample Access ---")
-# # Use all_extracted_info dictionary now
-# # for relative_filepath, data in all_extracted_info.items():
-# #     print(f"\nAccessing data for: {relative_filepath}")
-# #     print("  Metadata:", data['metadata'])
-# #     print("  Inferred Type:", data.get('inferred_sensor_type'))
-# #
-# #     if data['timestamps'] is not None:
-# #         print(f"  Timestamps shape: {data['timestamps'].shape}")
-# #         # print("  First 5 timestamps:", data['timestamps'][:5])
-# #
-# #     print(f"  Sample Rate: {data.get('sample_rate', 'Not found')} Hz")
-# #
-# #     print("  Sensor Data:")
-# #     if 'sensor_values' in data and data['sensor_values']:
-# #         for sensor_name, values in data['sensor_values'].items():
-# #             print(f"    '{sensor_name}': shape={values.shape}, size={values.size}") # Added size check
-# #             # Check if data is non-empty before trying to print values
-# #             # if values.size > 0:
-# #             #     print(f"      First 5 values: {values.flatten()[:min(5, values.size)]}")
-# #
-# #             # You can look up properties for TDMS files by the descriptive sensor_name
-# #             unit = '?'
-# #             if data.get('inferred_sensor_type', '').startswith('Vibration'):
-# #                  unit = 'g' # Based on description
-# #             elif data.get('inferred_sensor_type', '').startswith('Acoustic'):
-# #                  unit = 'Pa' # Based on description
-# #             elif data.get('inferred_sensor_type') == 'Temp_Current (TDMS)':
-# #                  # Try to get unit from stored channel properties using the descriptive name
-# #                  if sensor_name in data.get('channel_properties', {}): # channel_properties only has data for non-empty sensors now
-# #                       unit = data['channel_properties'][sensor_name].get('unit_string', '?')
-# #                  else:
-# #                       unit = 'C/A' # Fallback unit hint
-# #             print(f"      Unit (estimated or from properties): {unit}")
-# #     else:
-# #         print("    No sensor values extracted.")
-# #
-# #     # If you want raw TDMS channel names and properties (stored by raw name):
-# #     # if data.get('inferred_sensor_type', '').endswith('(TDMS)'): # Check if it's any TDMS type
-# #     #     print("  Raw TDMS Channel Names (Channels attempted to read non-empty data from):", data.get('raw_channel_names'))
-# #     #     # Properties for ALL configured channels found in the group (whether data was readable or not)
-# #     #     print("  Properties for ALL configured channels found (by raw name):", data.get('all_channel_properties_raw')) # May be very verbose
-# #     #     # Properties for channels with non-empty data (by descriptive name)
-# #     #     print("  Properties for channels with NON-EMPTY data (by descriptive name):", data.get('channel_properties')) # May be very verbose
-# #
-# #     # Print extraction error/warning if present
-# #     # if 'extraction_error' in data: print("  Extraction Error:", data['extraction_error'])
-# #     # if 'extraction_warning' in data: print("  Extraction Warning:", data['extraction_warning'])
-# #     # if 'channel_read_errors' in data: print("  Channel Read Errors (TDMS):", data['channel_read_errors'])
-# # print("\n--- End Sample Access ---")
-
-
-# --- Saving the Extracted Data (Optional - Uncomment to use) ---
-# # Saving to HDF5 is highly recommended for large datasets.
-# # Make sure you have h5py installed (`pip install h5py`).
-#
-import h5py # Uncomment if saving to HDF5
-
-hdf5_output_path = 'extracted_dataset_structured.h5'
+            relevant_files_attempted += 1
+            # The header and the buffered output of the worker for this file go out as one record, at the level of its
+            # most severe message (plain prints count as INFO). With --quiet, a file's warnings and errors are still
+            # logged under the name of the file they belong to.
+            logger.log(max(output_level, logging.INFO), "\nProcessing relevant file %s: %s%s",
+                       relevant_files_attempted, relative_filepath, '\n' + output.rstrip('\n') if output else '')
+
+            # --- Process the result from extraction function ---
+            if extracted_info is not None:
+                # The extraction function returned an ExtractionResult (success or contained error info)
+
+                # Check if the result contains non-empty sensor data. The extractor already listed the non-empty sensors in
+                # sensor_names, so the arrays are not scanned again here
+                if extracted_info.sensor_names:
+                     # Contains at least one non-empty sensor data array
+                     processed_with_data_files.append(relative_filepath)
+                     logger.info("    Result: Processed with Data.")
+                     logger.info("    Inferred Sensor Type: %s", extracted_info.inferred_sensor_type or 'N/A')
+                     # Use the sensor_names list which only includes names with non-empty data now
+                     logger.info("    Extracted Sensors: %s (Non-empty data)", extracted_info.sensor_names)
+                     # Number of samples of the first extracted NON-EMPTY sensor array, taken by the worker (the arrays
+                     # themselves are not sent back when the worker already wrote them to its part file)
+                     if extracted_info.num_samples is not None:
+                         logger.info("    Number of Samples (first non-empty): %s", extracted_info.num_samples)
+                     else:
+                         logger.info("    Number of Samples: N/A (Logic error, should have non-empty data)") # Should not happen here
+
+                     logger.info("    Sample Rate: %s Hz", extracted_info.sample_rate)
+                     logger.info("    Timestamps extracted/generated: %s", extracted_info.timestamps is not None)
+
+                else:
+                     # Returned info, but no non-empty sensor data was found/extracted (includes cases where function reported an error/warning)
+                     processed_metadata_only_files.append(relative_filepath)
+                     logger.info("    Result: Processed (Metadata Only).")
+                     logger.info("    Inferred Sensor Type: %s", extracted_info.inferred_sensor_type or 'N/A')
+                     # List sensors that were found, even if empty data
+                     all_found_sensor_names = list(extracted_info.sensor_values)
+                     logger.info("    Extracted Sensors (found, but data was empty or unreadable): %s", all_found_sensor_names)
+                     logger.info("    Sample Rate (hint): %s Hz", extracted_info.sample_rate)
+                     # Optional: print specific extraction error/warning from the result
+                     if extracted_info.extraction_error is not None:
+                         logger.info("    Extraction Error/Reason: %s", extracted_info.extraction_error)
+                     elif extracted_info.extraction_warning is not None:
+                         logger.info("    Extraction Warning: %s", extracted_info.extraction_warning)
+
+                # Write this file's group right away; nothing holds on to its arrays after this iteration
+                if h5file is not None:
+                     try:
+                          if HDF5_PARTS_DIRECTORY is None:
+                               # Saved in this thread on purpose: h5py holds one global lock around every HDF5 call, so a
+                               # thread pool here would not overlap anything. The compression already ran in the worker
+                               # for the large datasets (see _precompress_sensor_values).
+                               save_file_to_hdf5(h5file, relative_filepath, extracted_info)
+                          elif extracted_info.hdf5_part is not None:
+                               # Already written by the worker; link the group under the name it has in the part file
+                               group_name = _safe_key(relative_filepath, 'file_', _HDF5_SAFE_GROUP)
+                               if h5file.get(group_name, getlink=True) is not None: # getlink: no need to open the part file
+                                    # Another file with the same HDF5-safe name was linked first (the single file refuses it
+                                    # in create_group the same way); this file's part is not kept
+                                    logger.error("Error saving data for %s to HDF5: group '%s' already holds another file with the same HDF5-safe name.", relative_filepath, group_name)
+                                    os.remove(extracted_info.hdf5_part)
+                               else:
+                                    h5file[group_name] = h5py.ExternalLink(os.path.join(hdf5_parts_link_directory, os.path.basename(extracted_info.hdf5_part)), '/' + group_name)
+                     except Exception as e:
+                          logger.error("Error saving data for %s to HDF5: %s", relative_filepath, e)
 
-try:
-    print(f"\nSaving extracted data structure to {hdf5_output_path}...")
-    # Use 'all_extracted_info' dictionary now
-    with h5py.File(hdf5_output_path, 'w') as f:
-
-        for relative_filepath, data in all_extracted_info.items():
-            # We store all_extracted_info, so this loop includes files with data and metadata only.
-            # The HDF5 saving logic should handle what gets saved based on data content.
-
-            # Create a group for each file. Use relative path, but make it HDF5-safe.
-            # Replace / with __, . with _, and other potentially problematic characters
-            group_name = relative_filepath.replace(os.sep, '__').replace('.', '_').replace(' ', '_').replace('-', '_').replace(':', '_').replace('[', '').replace(']', '').replace('<', '_').replace('>', '_').replace('\'', '').replace('\"', '').replace('~', '_') # Added ~
-            # Ensure it doesn't start with a reserved character (like _) or is empty
-            if not group_name or not group_name[0].isalnum(): group_name = 'file_' + group_name.lstrip('_')
-            # Ensure group name is not empty after cleaning
-            if not group_name:
-                print(f"Warning: Generated empty HDF5 group name for {relative_filepath}. Skipping save for this file.")
-                continue
+            else:
+                # This case should be rare with the updated functions returning dictionaries,
+                # but it handles scenarios where the extraction function itself returned None.
+                # This would typically indicate a critical failure within the function itself.
+                logger.error("    Result: Extraction Function Returned None (Critical Failure).")
+                # These files are not saved to HDF5, and they aren't included
+                # in processed_with_data_files or processed_metadata_only_files.
+                # They are implicitly accounted for by `relevant_files_attempted` minus
+                # the sum of the other two lists.
+
+    if h5file is not None:
+        print(f"\nSuccessfully saved extracted data structure to {hdf5_output_path}")
+
+    # --- Final Summary ---
+    print(f"\n--- Processing Summary ---")
+    print(f"Total files found in base directory: {total_files_in_directory}")
+    print(f"Files skipped initially (hidden/system or pattern mismatch): {len(skipped_initial_files)}")
+    print(f"Files matching expected pattern (.mat/.tdms) and attempted: {relevant_files_attempted}")
+    print(f"  Processed successfully (with non-empty data): {len(processed_with_data_files)}")
+    print(f"  Processed (metadata/properties only, no non-empty data): {len(processed_metadata_only_files)}")
+    # Calculate files where extraction function returned None
+    files_returning_none = relevant_files_attempted - len(processed_with_data_files) - len(processed_metadata_only_files)
+    print(f"  Extraction function returned None (critical failure): {files_returning_none}") # This count should ideally be 0
+
+    print(f"--------------------------")
+
+    # Verification checks
+    total_categorized_at_start = len(skipped_initial_files) + relevant_files_attempted
+    print(f"Check: Total files found ({total_files_in_directory}) == Sum of initial parse outcomes ({total_categorized_at_start})")
+    if total_files_in_directory == total_categorized_at_start:
+         print("Check successful.")
+    else:
+         print("Check failed: Sum of initial outcomes ({total_categorized_at_start}) does not match total files found ({total_files_in_directory}).")
 
-            try:
-                file_group = f.create_group(group_name)
-                # print(f"  Created group: {group_name}") # Optional debug
-            except Exception as e:
-                 print(f"Error creating HDF5 group for {relative_filepath} (name: {group_name}): {e}. Skipping save for this file.")
-                 continue
+    total_relevant_outcomes = len(processed_with_data_files) + len(processed_metadata_only_files) + files_returning_none
+    print(f"Check: Relevant files attempted ({relevant_files_attempted}) == Sum of processing outcomes ({total_relevant_outcomes})")
+    if relevant_files_attempted == total_relevant_outcomes:
+        print("Check successful.")
+    else:
+        print("Check failed: Sum of outcomes ({total_relevant_outcomes}) does not match attempted files ({relevant_files_attempted}).")
 
-            # Store metadata as attributes on the group
-            if 'metadata' in data:
-                meta_dict = data['metadata'].copy()
-                # Remove 'filepath' from metadata before saving as attribute if you prefer relative paths
-                if 'filepath' in meta_dict: del meta_dict['filepath']
-                # Add relative path as an attribute if it wasn't in metadata originally
-                if 'relative_filepath' not in meta_dict:
-                     meta_dict['relative_filepath_str'] = relative_filepath # Save as string attribute
-
-                for key, value in meta_dict.items():
-                    # Clean keys to be HDF5-safe attributes (should be strings)
-                    attr_key = key.replace('.', '_').replace('~', '_').replace(' ', '_').replace('-', '_').replace(':', '_').replace('[', '').replace(']', '')
-                    if not attr_key or not attr_key[0].isalnum(): attr_key = 'attr_' + attr_key.lstrip('_') # Safe attribute key
-                    # Convert complex types or numpy object arrays to something savable as HDF5 attribute
-                    value_to_save = None
-                    try:
-                        if isinstance(value, np.ndarray):
-                             if value.dtype.hasobject:
-                                  value_to_save = str(value) # Convert object arrays to string representation
-                             elif value.ndim == 0: # Handle numpy scalar arrays
-                                  value_to_save = value.item() # Extract Python scalar
-                             else: # Attempt to save small numeric arrays directly
-                                 # Check if array is small enough and contains only simple types
-                                 if value.size < 10 and np.issubdtype(value.dtype, np.number):
-                                       value_to_save = value
-                                 else:
-                                      value_to_save = str(value) # Too large or complex array to save as attribute
-
-                        elif isinstance(value, bytes):
-                             value_to_save = value.decode('utf-8', errors='ignore')
-                        elif isinstance(value, (list, tuple)):
-                             # Attempt to convert list/tuple of simple types to numpy array for attribute
-                             try:
-                                if all(isinstance(i, (str, int, float, np.number, np.bool_)) for i in value):
-                                     # For lists of strings, use h5py's string dtype
-                                     if all(isinstance(i, str) for i in value):
-                                          value_to_save = np.array(value, dtype=h5py.string_dtype(encoding='utf-8'))
-                                     else: # For lists of numbers/bools
-                                          value_to_save = np.array(value)
-                                else:
-                                     value_to_save = str(value) # Fallback for mixed/complex lists
-                             except Exception:
-                                  value_to_save = str(value) # Fallback if conversion fails
-
-                        elif isinstance(value, (str, int, float, bool, np.bool_, np.number)):
-                             value_to_save = value # Simple types are fine
-                        else:
-                             value_to_save = str(value) # Fallback for other complex types
-
-                        # Save the attribute if the value_to_save is not None
-                        if value_to_save is not None:
-                             try:
-                                  # Check if the resulting value_to_save type is supported by HDF5 attributes
-                                  # Simple check: h5py attributes generally support scalars, numpy arrays of basic types, strings.
-                                  if isinstance(value_to_save, (str, int, float, bool, np.bool_, np.number)):
-                                       file_group.attrs[attr_key] = value_to_save
-                                  elif isinstance(value_to_save, np.ndarray) and not value_to_save.dtype.hasobject:
-                                        file_group.attrs[attr_key] = value_to_save
-                                  else:
-                                       # Convert to string if complex type is not directly supported
-                                       file_group.attrs[attr_key] = str(value_to_save)
-
-                             except Exception as e:
-                                  print(f"Warning: Could not save attribute '{key}' ({attr_key}) for {relative_filepath} (value: {value_to_save}, type: {type(value_to_save)}): {e}. Skipping attribute.")
-
-                    except Exception as e:
-                         print(f"Warning: Error preparing attribute '{key}' for {relative_filepath} (value: {value}, type: {type(value)}): {e}. Skipping attribute.")
-
-
-            # Store inferred type as attribute
-            if 'inferred_sensor_type' in data and data['inferred_sensor_type'] is not None:
-                try:
-                    file_group.attrs['inferred_sensor_type'] = data['inferred_sensor_type']
-                except Exception as e:
-                     print(f"Warning: Could not save 'inferred_sensor_type' attribute for {relative_filepath}: {e}")
 
-            # Store extraction error/warning as attribute if present
-            if 'extraction_error' in data:
-                try:
-                    file_group.attrs['extraction_error'] = data['extraction_error']
-                except Exception as e: print(f"Warning: Could not save extraction_error attribute for {relative_filepath}: {e}")
-            if 'extraction_warning' in data:
-                 try:
-                     file_group.attrs['extraction_warning'] = data['extraction_warning']
-                 except Exception as e: print(f"Warning: Could not save extraction_warning attribute for {relative_filepath}: {e}")
-            if 'channel_read_errors' in data: # Save TDMS channel read errors
-                 try:
-                      # Convert dict of errors to a list of strings or save as nested attributes/dataset?
-                      # Saving as attributes on a sub-group seems best.
-                      read_errors_group = file_group.create_group('channel_read_errors')
-                      for chan_name, error_msg in data['channel_read_errors'].items():
-                           # Save each error as an attribute named after the channel
-                           chan_name_safe = chan_name.replace('.', '_').replace('/', '_').replace('\\', '_').replace(' ', '_').replace('-', '_').replace(':', '_').replace('[', '').replace(']', '').replace('<', '_').replace('>', '_').replace('\'', '').replace('\"', '').replace('~', '_')
-                           if not chan_name_safe or not chan_name_safe[0].isalnum(): chan_name_safe = 'chan_' + chan_name_safe.lstrip('_')
-                           try:
-                               read_errors_group.attrs[chan_name_safe] = str(error_msg)
-                           except Exception as e:
-                               print(f"Warning: Could not save channel read error for '{chan_name}' ({chan_name_safe}) in {relative_filepath}: {e}")
-                 except Exception as e:
-                      print(f"Warning: Could not create 'channel_read_errors' group for {relative_filepath}: {e}")
-
-
-            # Store properties for ALL configured channels found (TDMS only)
-            if 'all_channel_properties_raw' in data and data['all_channel_properties_raw']:
-                 props_group_raw = None
-                 try:
-                     # Create a group for all raw properties
-                     props_group_raw = file_group.create_group('all_channel_properties_raw')
-                 except Exception as e:
-                      print(f"Warning: Could not create 'all_channel_properties_raw' group for {relative_filepath}: {e}")
-
-                 if props_group_raw:
-                     # Iterate through properties stored using the raw names
-                     for raw_channel_name, props in data['all_channel_properties_raw'].items():
-                          # Create a sub-group for properties of each channel (using raw name as group name)
-                          channel_prop_group_name_raw = raw_channel_name.replace('.', '_').replace('/', '_').replace('\\', '_').replace(' ', '_').replace('-', '_').replace(':', '_').replace('[', '').replace(']', '').replace('<', '_').replace('>', '_').replace('\'', '').replace('\"', '').replace('~', '_')
-                          if not channel_prop_group_name_raw or not channel_prop_group_name_raw[0].isalnum(): channel_prop_group_name_raw = 'raw_chan_' + channel_prop_group_name_raw.lstrip('_')
-                          try:
-                              channel_prop_group_raw = props_group_raw.create_group(channel_prop_group_name_raw)
-                          except Exception as e:
-                               print(f"Warning: Could not create raw channel property group '{channel_prop_group_name_raw}' for channel '{raw_channel_name}' in {relative_filepath}: {e}. Skipping raw channel properties.")
-                               continue
-
-                          # Save each property as an attribute in the channel's sub-group
-                          for p_key, p_value in props.items():
-                               p_key_safe = p_key.replace('.', '_').replace('/', '_').replace('\\', '_').replace(' ', '_').replace('-', '_').replace(':', '_').replace('[', '').replace(']', '').replace('<', '_').replace('>', '_').replace('\'', '').replace('\"', '').replace('~', '_')
-                               if not p_key_safe or not p_key_safe[0].isalnum(): p_key_safe = 'p_' + p_key_safe.lstrip('_')
-
-                               # Attempt to save as attribute if simple type
-                               # Check if the value is directly supported by HDF5 attributes
-                               p_value_to_save = p_value
-                               try:
-                                    if isinstance(p_value, (str, int, float, bool, np.bool_, np.number)):
-                                         pass # Simple types are fine
-                                    elif isinstance(p_value, bytes):
-                                         p_value_to_save = p_value.decode('utf-8', errors='ignore')
-                                    elif isinstance(p_value, np.ndarray) and p_value.ndim == 0 and np.isscalar(p_value.item()): # Handle numpy scalar arrays
-                                         p_value_to_save = p_value.item() # Extract Python scalar
-                                    else: # Fallback for complex types or arrays
-                                         p_value_to_save = str(p_value)
-
-                                    # Save the attribute
-                                    if p_value_to_save is not None:
-                                         channel_prop_group_raw.attrs[p_key_safe] = p_value_to_save
-
-                               except Exception as e:
-                                    # Fallback to string if attribute saving failed
-                                    try:
-                                         channel_prop_group_raw.attrs[p_key_safe] = str(p_value)
-                                    except Exception as e_str:
-                                         print(f"Warning: Could not save raw property '{p_key}' for channel '{raw_channel_name}' in {relative_filepath} (value: {p_value}, type: {type(p_value)}): {e} / {e_str}. Skipping property.")
-
-
-            # Store sensor values (each sensor with NON-EMPTY data as a dataset within a 'sensor_values' group)
-            # FIX INDENTATION HERE
-            if 'sensor_values' in data and data['sensor_values']:
-                 # Only create the group if there is at least one non-empty sensor array
-                 if any(isinstance(arr, np.ndarray) and arr.size > 0 for arr in data['sensor_values'].values()):
-                     sensors_group = None
-                     try:
-                          sensors_group = file_group.create_group('sensor_values')
-                          # print(f"  Created 'sensor_values' group.") # Optional debug
-                     except Exception as e:
-                          print(f"Error creating sensor values group for {relative_filepath}: {e}")
-
-                     if sensors_group:
-                          for sensor_name, values_array in data['sensor_values'].items():
-                               if isinstance(values_array, np.ndarray) and values_array.size > 0: # Only save non-empty data
-                                    # Ensure sensor name is a valid HDF5 dataset name
-                                    dataset_name = sensor_name.replace('.', '_').replace('/', '_').replace('\\', '_').replace(' ', '_').replace('-', '_').replace(':', '_').replace('[', '').replace(']', '').replace('<', '_').replace('>', '_').replace('\'', '').replace('\"', '').replace('~', '_') # Add more replacements for safety
-                                    if not dataset_name or not dataset_name[0].isalnum(): dataset_name = 'sensor_' + dataset_name.lstrip('_') # Ensure not empty and doesn't start with invalid chars
-
-                                    # Convert object arrays or non-numeric arrays to something savable (float or string)
-                                    values_array_savable = None
-                                    if values_array.dtype.hasobject:
-                                         print(f"Warning: Sensor '{sensor_name}' in {relative_filepath} has object dtype. Attempting conversion to string for saving.")
-                                         try:
-                                             # Flatten object array and convert each element to string
-                                             values_array_savable = np.array([str(x) for x in values_array.flatten()], dtype=h5py.string_dtype(encoding='utf-8'))
-                                         except Exception as conv_e:
-                                              print(f"Error converting object array for '{sensor_name}' to string: {conv_e}. Skipping dataset.")
-                                              continue # Skip this sensor dataset
-                                    elif not np.issubdtype(values_array.dtype, np.number):
-                                         print(f"Warning: Sensor '{sensor_name}' in {relative_filepath} has non-numeric dtype {values_array.dtype}. Attempting conversion to float.")
-                                         try:
-                                              values_array_savable = values_array.astype(float)
-                                         except Exception as conv_e:
-                                              print(f"Error converting non-numeric array for '{sensor_name}' to float: {conv_e}. Skipping dataset.")
-                                              continue
-                                    else:
-                                        values_array_savable = values_array # Data is already numeric and standard
-
-                                    # Ensure data is 1D or 2D for consistency in HDF5 datasets
-                                    if values_array_savable is not None:
-                                        if values_array_savable.ndim == 0: # Handle scalar? Make it 1D
-                                             values_array_savable = np.array([values_array_savable])
-                                        elif values_array_savable.ndim > 2: # Flatten >2D
-                                             print(f"Warning: Dataset '{dataset_name}' from '{sensor_name}' in {relative_filepath} has >2D shape {values_array_savable.shape}. Flattening to 1D.")
-                                             values_array_savable = values_array_savable.flatten()
-
-                                    if values_array_savable is not None:
-                                         try:
-                                              # h5py dataset names cannot start with '.'
-                                              if dataset_name.startswith('.'): dataset_name = '_' + dataset_name
-                                              sensors_group.create_dataset(dataset_name, data=values_array_savable, compression="gzip") # Add compression
-                                              # print(f"  Saved dataset '{dataset_name}' (shape {values_array_savable.shape}).") # Optional debug
-                                         except Exception as e:
-                                              print(f"Error saving dataset '{dataset_name}' for sensor '{sensor_name}' in {relative_filepath}: {e}. Skipping dataset.")
-                               else:
-                                    # print(f"  Skipping saving dataset '{sensor_name}' - data is empty or None.") # Optional debug
-                                    pass # Skip saving empty data
-
-                 # else:
-                 #      print(f"  No non-empty sensor values to save for {relative_filepath}.") # Optional debug message
-
-
-            # Store timestamps if available (only if there was at least one non-empty sensor data array saved)
-            if 'timestamps' in data and data['timestamps'] is not None and (sensors_group is not None or (data['sensor_values'] and any(isinstance(arr, np.ndarray) and arr.size > 0 for arr in data['sensor_values'].values()))):
-            # Check if timestamps exist AND either the sensors_group was created (meaning non-empty data exists) OR the sensor_values dict *contains* non-empty data (handles case where sensors_group creation failed)
-                 try:
-                      # Ensure timestamps are numeric and 1D before saving
-                      if isinstance(data['timestamps'], np.ndarray) and data['timestamps'].dtype.kind in 'fiu':
-                          timestamps_to_save = data['timestamps'].flatten()
-                          # Save timestamps dataset at the file group level
-                          file_group.create_dataset('timestamps', data=timestamps_to_save, compression="gzip")
-                          # print(f"  Saved timestamps.") # Optional debug
-                      else:
-                           print(f"Warning: Timestamps for {relative_filepath} are not a numeric numpy array ({type(data['timestamps'])} {getattr(data['timestamps'], 'dtype', 'N/A')}). Skipping save.")
-
-                 except Exception as e:
-                      print(f"Error saving timestamps for {relative_filepath}: {e}")
-                      # import traceback; traceback.print_exc()
-
-            # Store sample rate as attribute if available (regardless of data presence, if extracted)
-            if 'sample_rate' in data and data['sample_rate'] is not None:
-                 try:
-                      file_group.attrs['sample_rate'] = float(data['sample_rate']) # Ensure it's a float
-                      # print(f"  Saved sample rate ({data['sample_rate']:.2f} Hz).") # Optional debug
-                 except Exception as e:
-                      print(f"Error saving sample rate attribute for {relative_filepath}: {e}")
-                      # import traceback; traceback.print_exc()
-
-
-    print(f"\nSuccessfully saved extracted data structure to {hdf5_output_path}")
+    # --- Print lists of file outcomes ---
+    print("\n--- Danh sách các tệp đã trích xuất ĐẦY ĐỦ DỮ LIỆU ---")
+    if processed_with_data_files:
+        for i, filepath in enumerate(sorted(processed_with_data_files)):
+            print(f"{i + 1}. {filepath}")
+    else:
+        print("Không có tệp nào được trích xuất đầy đủ dữ liệu cảm biến.")
 
-except ImportError:
-     print("\nError: h5py library not found. Cannot save to HDF5. Install with: pip install h5py")
-except Exception as e:
-    print(f"\nError saving data to HDF5: {e}")
-    import traceback
-    traceback.print_exc()
\ No newline at end of file
+    print("\n--- Danh sách các tệp đã trích xuất CHỈ METADATA/PROPERTIES (Không có dữ liệu tín hiệu non-empty) ---")
+    if processed_metadata_only_files:
+        for i, filepath in enumerate(sorted(processed_metadata_only_files)):
+            print(f"{i + 1}. {filepath}")
+    else:
+        print("Không có tệp nào được trích xuất chỉ metadata/properties.")
+
+    print("\n--- Danh sách các tệp KHÔNG THỂ XỬ LÝ HOẶC BỊ BỎ QUA BAN ĐẦU ---")
+    # This list combines files skipped initially and files where the extraction function returned None.
+    # The summary counters give the breakdown. This list just provides the paths for initially skipped files.
+    print("\n--- Files skipped initially (hidden/system or pattern mismatch) ---")
+    if skipped_initial_files:
+         for i, filepath in enumerate(sorted(skipped_initial_files)):
+              print(f"{i+1}. {filepath}")
+    else:
+         print("Không có tệp nào bị bỏ qua ban đầu.")
+
+    if files_returning_none > 0:
+        print(f"\n--- Files where extraction function returned NONE (critical failure) ---")
+        print(f"({files_returning_none} files - details were printed above during processing)")
+        # We don't have a specific list of paths for these easily here without storing them earlier.
+        # The printed output during processing should give details for these.
+
+
+    # --- How to access the extracted data (Example - Uncomment to use) ---
+    # print("\n--- Sample Access ---")
+    # # Results are not kept after they are saved, so this goes inside the main loop above
+    # # (the saved groups can also be read back from the HDF5 file, see read_file_h5.py / h5_to_csv.py)
+    # # data = extracted_info
+    # # if data is not None:
+    # #     print(f"\nAccessing data for: {relative_filepath}")
+    # #     print("  Metadata:", data.metadata)
+    # #     print("  Inferred Type:", data.inferred_sensor_type)
+    # #
+    # #     if data.timestamps is not None:
+    # #         print(f"  Timestamps shape: {data.timestamps.shape}")
+    # #         # print("  First 5 timestamps:", data.timestamps[:5])
+    # #
+    # #     print(f"  Sample Rate: {data.sample_rate} Hz")
+    # #
+    # #     print("  Sensor Data:")
+    # #     if data.sensor_values:
+    # #         for sensor_name, values in data.sensor_values.items():
+    # #             print(f"    '{sensor_name}': shape={values.shape}, size={values.size}") # Added size check
+    # #             # Check if data is non-empty before trying to print values
+    # #             # if values.size > 0:
+    # #             #     print(f"      First 5 values: {values.flatten()[:min(5, values.size)]}")
+    # #
+    # #             # You can look up properties for TDMS files by the descriptive sensor_name
+    # #             unit = '?'
+    # #             if data.inferred_sensor_type.startswith('Vibration'):
+    # #                  unit = 'g' # Based on description
+    # #             elif data.inferred_sensor_type.startswith('Acoustic'):
+    # #                  unit = 'Pa' # Based on description
+    # #             elif data.inferred_sensor_type == 'Temp_Current (TDMS)':
+    # #                  # Try to get unit from stored channel properties using the descriptive name
+    # #                  if sensor_name in data.channel_properties: # channel_properties only has data for non-empty sensors now
+    # #                       unit = data.channel_properties[sensor_name].get('unit_string', '?')
+    # #                  else:
+    # #                       unit = 'C/A' # Fallback unit hint
+    # #             print(f"      Unit (estimated or from properties): {unit}")
+    # #     else:
+    # #         print("    No sensor values extracted.")
+    # #
+    # #     # If you want raw TDMS channel names and properties (stored by raw name):
+    # #     # if data.inferred_sensor_type.endswith('(TDMS)'): # Check if it's any TDMS type
+    # #     #     print("  Raw TDMS Channel Names (Channels attempted to read non-empty data from):", data.raw_channel_names)
+    # #     #     # Properties for ALL configured channels found in the group (whether data was readable or not)
+    # #     #     print("  Properties for ALL configured channels found (by raw name):", data.all_channel_properties_raw) # May be very verbose
+    # #     #     # Properties for channels with non-empty data (by descriptive name)
+    # #     #     print("  Properties for channels with NON-EMPTY data (by descriptive name):", data.channel_properties) # May be very verbose
+    # #
+    # #     # Print extraction error/warning if present
+    # #     # if data.extraction_error is not None: print("  Extraction Error:", data.extraction_error)
+    # #     # if data.extraction_warning is not None: print("  Extraction Warning:", data.extraction_warning)
+    # #     # if data.channel_read_errors: print("  Channel Read Errors (TDMS):", data.channel_read_errors)
+    # # print("\n--- End Sample Access ---")
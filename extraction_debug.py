@@ -0,0 +1,71 @@
+"""
+Debugging helpers for extraction.py.
+They are kept out of the main module so a normal run doesn't load them; extraction.py imports
+this module only when logging is at DEBUG level (run with --debug).
+"""
+import scipy.io as sio
+import numpy as np
+
+
+# --- Helper Function to print the structure of a MATLAB object/struct ---
+def print_mat_structure(obj, indent=0, name="mat_object"):
+    """Recursively prints the structure of a MATLAB object loaded by scipy.io.loadmat."""
+    prefix = "  " * indent
+
+    # Check if it's a MATLAB struct - more robust check
+    if isinstance(obj, sio.matlab.mat_struct) and hasattr(obj, '_fieldnames'):
+        print(f"{prefix}Struct '{name}':")
+        if not obj._fieldnames:
+            print(f"{prefix}  (No fields)")
+        else:
+            for field_name in obj._fieldnames:
+                try:
+                    print_mat_structure(getattr(obj, field_name), indent + 1, field_name)
+                except Exception as e:
+                    print(f"{prefix}  Error accessing field '{field_name}': {e}")
+
+    elif isinstance(obj, np.ndarray):
+        print(f"{prefix}NumPy Array '{name}': shape={obj.shape}, dtype={obj.dtype}")
+        if obj.dtype.hasobject:
+            # print(f"{prefix}  Contains Objects. Exploring first few elements:") # Keep output shorter
+            elements_to_show = []
+            try:
+                if obj.size > 0:
+                    # Try accessing first few elements robustly
+                    flat_obj = obj.flatten()
+                    elements_to_show = [flat_obj[i] for i in range(min(1, flat_obj.size))] # Only show 1 element for brevity
+            except Exception as e:
+                # print(f"{prefix}    Could not access elements to show: {e}") # Too noisy maybe?
+                elements_to_show = []
+
+            for i, elem in enumerate(elements_to_show):
+                print(f"{prefix}  Element [{i}] type: {type(elem)}")
+                # Recursively print structure for complex types, value for simple ones
+                if isinstance(elem, (sio.matlab.mat_struct, np.ndarray, list, tuple, dict, np.void)): # Added np.void
+                     print_mat_structure(elem, indent + 2, f"element_[{i}]_content")
+                else: # Print value representation
+                     value_repr = repr(elem)
+                     if len(value_repr) > 100: value_repr = value_repr[:97] + "..."
+                     print(f"{prefix}  Element [{i}] value: {value_repr}")
+             # If obj.size > len(elements_to_show): print(f"{prefix}  ...") # Keep output shorter
+             # if obj.size == 0: print(f"{prefix}  (Empty object array)") # Keep output shorter
+
+    elif isinstance(obj, np.void): # Handle numpy.void (structured array element) directly
+         print(f"{prefix}NumPy Void (Struct Record) '{name}': dtype={obj.dtype}")
+         if obj.dtype.names:
+             for field_name in obj.dtype.names:
+                 try:
+                     # Access element by field name. Result might be a scalar or array
+                     field_value = obj[field_name]
+                     print_mat_structure(field_value, indent + 1, field_name)
+                 except Exception as e:
+                     print(f"{prefix}  Error accessing field '{field_name}': {e}")
+         else:
+              print(f"{prefix}  (No fields)")
+
+
+    else:
+        # Print basic types and their values
+        value_repr = repr(obj)
+        if len(value_repr) > 100: value_repr = value_repr[:97] + "..."
+        print(f"{prefix}Basic Type '{name}': type={type(obj)}, value={value_repr}")
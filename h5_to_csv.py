@@ -1,120 +1,487 @@
 import h5py
 import numpy as np
 import os
+import sys
+import gzip
 import pandas as pd
+import csv
+import itertools
+import io
+import contextlib
+import multiprocessing
+
+# pyarrow ghi CSV bằng C++ (nhanh hơn nhiều so với df.to_csv); nếu chưa cài thì dùng pandas như cũ
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    _PYARROW_AVAILABLE = True
+except ImportError:
+    _PYARROW_AVAILABLE = False
+
+# psutil (nếu có) cho biết RAM còn trống khi chạy với --in-memory; không có thì dùng os.sysconf (POSIX)
+try:
+    import psutil
+    _PSUTIL_AVAILABLE = True
+except ImportError:
+    _PSUTIL_AVAILABLE = False
+
+# pyarrow.parquet cho đầu ra Parquet (--format parquet/both); có bản pyarrow được build không kèm Parquet
+try:
+    import pyarrow.parquet as pq
+    _PARQUET_AVAILABLE = True
+except ImportError:
+    _PARQUET_AVAILABLE = False
 
 # --- Configuration ---
 HDF5_FILE_PATH = 'extracted_dataset_structured.h5' # Đường dẫn đến tệp HDF5 đã trích xuất
 OUTPUT_VIBRATION_CSV_DIR = 'extracted_csv_data/vibration' # Thư mục cho dữ liệu vibration
 OUTPUT_ACOUSTIC_CSV_DIR = 'extracted_csv_data/acoustic' # Thư mục cho dữ liệu acoustic
+CSV_WRITE_BUFFER_BYTES = 16 * 1024 * 1024 # Kích thước bộ đệm khi ghi tệp CSV
+ROWS_PER_BLOCK = 1 << 16 # Số dòng đọc và ghi mỗi lần (làm tròn theo kích thước chunk của dataset)
+# Bộ nhớ đệm chunk khi đọc (mặc định của HDF5 chỉ 1 MiB, nhỏ hơn một chunk 65536 dòng x nhiều cảm biến của sensor_matrix,
+# nên chunk bị giải nén lại khi một lần đọc không khớp ranh giới chunk). Áp dụng cho cả các tệp *_parts qua external link.
+HDF5_READ_CACHE = {'rdcc_nbytes': 256 * 1024 * 1024, 'rdcc_nslots': 1_000_003, 'rdcc_w0': 0.75}
+# Chạy với --fp32 để ghi các cột cảm biến float64 dưới dạng float32 (ít chữ số hơn, tệp CSV nhỏ hơn). Timestamps vẫn giữ
+# kiểu gốc. Dữ liệu .mat vốn đã được extraction.py lưu dạng float32; cờ này chủ yếu có tác dụng với các kênh TDMS đã scale.
+FLOAT32_SENSORS = '--fp32' in sys.argv
+# Chạy với --in-memory để nạp cả tệp *_parts chứa dữ liệu của một group vào RAM (driver='core', backing_store=False) trước
+# khi đọc, nếu tệp nhỏ hơn IN_MEMORY_RAM_FRACTION RAM còn trống chia cho số tiến trình. Có ích khi tệp nằm trên ổ mạng hoặc
+# đĩa chậm và chưa có trong page cache (một lần đọc tuần tự thay vì từng chunk); nếu tệp đã được cache thì không nhanh hơn
+# (thời gian chủ yếu là giải nén) mà tốn thêm RAM. Không dùng với tệp HDF5 một khối (không có *_parts): mỗi group sẽ phải
+# nạp lại cả tệp.
+LOAD_IN_MEMORY = '--in-memory' in sys.argv
+IN_MEMORY_RAM_FRACTION = 0.5
+# Chạy với --gzip để ghi tệp *.csv.gz nén gzip mức CSV_GZIP_LEVEL (ít byte ghi xuống đĩa/ổ mạng hơn nhiều, tốn thêm ít CPU)
+COMPRESS_CSV = '--gzip' in sys.argv
+CSV_GZIP_LEVEL = 1
+CSV_EXTENSION = '.csv.gz' if COMPRESS_CSV else '.csv'
 
-# --- Conversion Script ---
+# Chạy với --format parquet (hoặc both) để ghi tệp <group>.parquet (nén zstd) thay cho (hoặc cùng với) tệp CSV: đọc lại
+# nhanh hơn nhiều so với phân tích CSV. Mặc định: csv. Cần pyarrow; nếu không có thì chỉ ghi CSV.
+OUTPUT_FORMATS = ('csv', 'parquet', 'both')
+OUTPUT_FORMAT = next((arg.split('=', 1)[1] for arg in sys.argv[1:] if arg.startswith('--format=')),
+                     sys.argv[sys.argv.index('--format') + 1] if '--format' in sys.argv[:-1] else 'csv')
+WRITE_PARQUET = OUTPUT_FORMAT in ('parquet', 'both') and _PARQUET_AVAILABLE
+WRITE_CSV = OUTPUT_FORMAT in ('csv', 'both') or not WRITE_PARQUET
 
-print(f"Attempting to convert data from HDF5 file: {HDF5_FILE_PATH}")
-print(f"Output CSV files for vibration will be saved in: {OUTPUT_VIBRATION_CSV_DIR}")
-print(f"Output CSV files for acoustic will be saved in: {OUTPUT_ACOUSTIC_CSV_DIR}")
+# --- Helper: Open a CSV File for Writing ---
+def open_csv(csv_filepath, binary=False):
+    """
+    Mở tệp CSV để ghi (chế độ văn bản, hoặc nhị phân nếu binary) với bộ đệm CSV_WRITE_BUFFER_BYTES.
+    Tệp có đuôi .gz được nén gzip mức CSV_GZIP_LEVEL trong lúc ghi.
+    """
+    mode, newline = ('wb', None) if binary else ('wt', '')
+    if csv_filepath.endswith('.gz'):
+        return gzip.open(csv_filepath, mode, compresslevel=CSV_GZIP_LEVEL, newline=newline)
+    return open(csv_filepath, mode, newline=newline, buffering=CSV_WRITE_BUFFER_BYTES)
 
-# Tạo thư mục nếu chưa có
-if not os.path.exists(OUTPUT_VIBRATION_CSV_DIR):
-    os.makedirs(OUTPUT_VIBRATION_CSV_DIR)
-    print(f"Created output directory for vibration: {OUTPUT_VIBRATION_CSV_DIR}")
+# --- Helper: Write One CSV ---
+def write_csv(column_names, row_blocks, csv_filepath):
+    """
+    Ghi các khối dòng (mỗi khối là danh sách mảng 1D, theo thứ tự column_names) ra tệp CSV, không có cột index,
+    và trả về (số dòng, số cột). Dùng pyarrow nếu có và mọi cột đều là số; không có pyarrow thì dùng np.savetxt khi mọi cột
+    cùng một kiểu số, còn lại dùng pandas. Dòng tiêu đề được ghi bằng module csv để giống hệt tiêu đề của pandas.
+    Mỗi khối được ghi xong trước khi lấy khối tiếp theo, nên row_blocks có thể dùng lại bộ nhớ của khối trước.
+    """
+    num_rows = 0
+    # Xem trước khối đầu tiên: pyarrow chỉ dùng cho cột số (chuỗi chứa dấu phẩy/ngoặc kép không ghi được khi quoting_style='none')
+    first_block = next(row_blocks, None)
+    if first_block is None:
+        with open_csv(csv_filepath) as csv_file:
+            csv.writer(csv_file, lineterminator='\n').writerow(column_names)
+        return num_rows, len(column_names)
+    row_blocks = itertools.chain([first_block], row_blocks)
+    numeric_only = all(np.asarray(column).dtype.kind in 'biuf' for column in first_block)
+    if not _PYARROW_AVAILABLE and numeric_only and len({np.asarray(column).dtype for column in first_block}) == 1:
+        # Không có pyarrow nhưng mọi cột cùng một kiểu số: ghép các cột của mỗi khối vào một mảng 2D cấp phát một lần
+        # rồi ghi bằng np.savetxt, không qua DataFrame. fmt='%s' in mỗi giá trị giống str() (số ngắn nhất đọc lại đúng
+        # giá trị, như pandas và pyarrow), không làm tròn như '%.15g'.
+        block_rows = len(first_block[0])
+        stacked = np.empty((block_rows, len(column_names)), dtype=np.asarray(first_block[0]).dtype)
+        with open_csv(csv_filepath) as csv_file:
+            csv.writer(csv_file, lineterminator='\n').writerow(column_names)
+            for columns in row_blocks:
+                rows = stacked[:len(columns[0])]
+                np.stack(columns, axis=1, out=rows)
+                np.savetxt(csv_file, rows, fmt='%s', delimiter=',')
+                num_rows += len(rows)
+        return num_rows, len(column_names)
+    if not _PYARROW_AVAILABLE or not numeric_only:
+        # Bộ đệm ghi lớn: dữ liệu được ghi xuống đĩa theo từng khối 16 MiB (ít lời gọi hệ thống, nhất là trên ổ mạng)
+        # mà không phải giữ toàn bộ nội dung CSV trong bộ nhớ như khi ghi vào StringIO trước
+        with open_csv(csv_filepath) as csv_file:
+            for block_index, columns in enumerate(row_blocks):
+                pd.DataFrame(dict(zip(column_names, columns))).to_csv(csv_file, index=False, header=(block_index == 0))
+                num_rows += len(columns[0])
+        return num_rows, len(column_names)
+    header = io.StringIO()
+    csv.writer(header, lineterminator='\n').writerow(column_names)
+    header_bytes = header.getvalue().encode('utf-8')
+    # Dữ liệu chỉ có số nên không cần dấu ngoặc kép; mỗi lần định dạng cả một khối dòng
+    write_options = pacsv.WriteOptions(include_header=False, quoting_style='none', batch_size=ROWS_PER_BLOCK)
+    if hasattr(os, 'writev') and not csv_filepath.endswith('.gz'):
+        # Mỗi khối được pyarrow định dạng vào bộ đệm riêng của nó; các bộ đệm được gom lại rồi ghi bằng một lời gọi
+        # os.writev mỗi khoảng CSV_WRITE_BUFFER_BYTES, không phải chép thêm một lần vào bộ đệm của đối tượng file Python
+        fd = os.open(csv_filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            pending_buffers, pending_bytes = [header_bytes], len(header_bytes)
+            for columns in row_blocks:
+                table = pa.Table.from_arrays(columns, names=column_names)
+                block_sink = pa.BufferOutputStream()
+                pacsv.write_csv(table, block_sink, write_options=write_options)
+                pending_buffers.append(block_sink.getvalue())
+                pending_bytes += pending_buffers[-1].size
+                num_rows += table.num_rows
+                if pending_bytes >= CSV_WRITE_BUFFER_BYTES:
+                    writev_all(fd, pending_buffers)
+                    pending_buffers, pending_bytes = [], 0
+            writev_all(fd, pending_buffers)
+        finally:
+            os.close(fd)
+        return num_rows, len(column_names)
+    # Tệp nén gzip (hoặc hệ điều hành không có os.writev, như Windows): ghi qua đối tượng file
+    with open_csv(csv_filepath, binary=True) as csv_file:
+        csv_file.write(header_bytes)
+        csv_writer = None
+        for columns in row_blocks:
+            table = pa.Table.from_arrays(columns, names=column_names)
+            if csv_writer is None:
+                csv_writer = pacsv.CSVWriter(csv_file, table.schema, write_options=write_options)
+            csv_writer.write_table(table)
+            num_rows += table.num_rows
+        if csv_writer is not None:
+            csv_writer.close()
+    return num_rows, len(column_names)
 
-if not os.path.exists(OUTPUT_ACOUSTIC_CSV_DIR):
-    os.makedirs(OUTPUT_ACOUSTIC_CSV_DIR)
-    print(f"Created output directory for acoustic: {OUTPUT_ACOUSTIC_CSV_DIR}")
+# --- Helper: Write Parquet Alongside ---
+def write_parquet_blocks(column_names, row_blocks, parquet_filepath):
+    """
+    Ghi từng khối dòng vào tệp Parquet parquet_filepath (mỗi khối là một row group, nén zstd) rồi trả lại (yield) chính
+    khối đó, nên các khối có thể được ghi tiếp ra CSV bằng write_csv trong cùng một lần đọc. Tệp được đóng khi hết khối.
+    """
+    parquet_writer = None
+    try:
+        for columns in row_blocks:
+            table = pa.Table.from_arrays(columns, names=column_names)
+            if parquet_writer is None:
+                # Dữ liệu đo liên tục, gần như không có giá trị lặp lại nên không dùng dictionary encoding
+                parquet_writer = pq.ParquetWriter(parquet_filepath, table.schema, compression='zstd', use_dictionary=False)
+            parquet_writer.write_table(table)
+            yield columns
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
 
-processed_count = 0
-skipped_no_data_count = 0
-error_count = 0
+# --- Helper: Vectored Write ---
+def writev_all(fd, buffers):
+    """Ghi hết các bộ đệm (bytes hoặc pyarrow.Buffer) vào fd theo thứ tự, gọi lại os.writev nếu chỉ ghi được một phần."""
+    views = [memoryview(buffer).cast('B') for buffer in buffers]
+    while views:
+        written = os.writev(fd, views)
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if views:
+            views[0] = views[0][written:]
 
-try:
-    # Mở tệp HDF5 ở chế độ chỉ đọc
-    with h5py.File(HDF5_FILE_PATH, 'r') as f:
-        # Duyệt qua tất cả các Group ở cấp cao nhất (mỗi Group là một tệp gốc)
-        for group_name in f.keys():
-            group = f[group_name]
-            relative_filepath = group.attrs.get('relative_filepath_str', group_name)
-
-            print(f"\nProcessing HDF5 Group: {group_name} (Original: {relative_filepath})")
-
-            # Kiểm tra xem Group này có chứa Dataset dữ liệu cảm biến không (MAT files with data)
-            if 'sensor_values' in group and isinstance(group['sensor_values'], h5py.Group):
-                sensor_values_group = group['sensor_values']
-
-                # Kiểm tra xem trong Group sensor_values có Dataset nào không
-                sensor_datasets = {
-                    name: sensor_values_group[name]
-                    for name in sensor_values_group.keys()
-                    if isinstance(sensor_values_group[name], h5py.Dataset) and sensor_values_group[name].size > 0
-                }
-
-                # Kiểm tra Dataset timestamps
-                timestamps_dataset = None
-                if 'timestamps' in group and isinstance(group['timestamps'], h5py.Dataset) and group['timestamps'].size > 0:
-                    timestamps_dataset = group['timestamps']
-
-                if sensor_datasets and timestamps_dataset:
-                    try:
-                        # Đọc dữ liệu
-                        timestamps_array = timestamps_dataset[:]
-                        first_sensor_name = list(sensor_datasets.keys())[0]
-                        first_sensor_array = sensor_datasets[first_sensor_name][:]
-
-                        # Kiểm tra số lượng mẫu khớp nhau giữa timestamps và sensor data
-                        if len(timestamps_array) != first_sensor_array.shape[0]:
-                            print(f"  Warning: Timestamps length ({len(timestamps_array)}) does not match sensor data length.")
-                            skipped_no_data_count += 1
-                            continue
+# --- Helper: Rebuild Evenly Spaced Timestamps ---
+def timestamps_from_attrs(attrs, row_start=0, row_stop=None):
+    """
+    Tạo lại các dòng row_start .. row_stop - 1 của timestamps đều nhau mà extraction.py chỉ lưu dưới dạng thuộc tính
+    của group (timestamps_start, timestamps_increment, timestamps_count, timestamps_dtype). Giá trị giống hệt
+    np.linspace(start, stop, count) (dataset 'timestamps' trước đây), chỉ tính cho các dòng được yêu cầu.
+    """
+    start = float(attrs['timestamps_start'])
+    count = int(attrs['timestamps_count'])
+    stop = start + (count - 1) * float(attrs['timestamps_increment'])
+    if row_stop is None:
+        row_stop = count
+    # Cùng phép tính với np.linspace: arange * step + start, phần tử cuối cùng đúng bằng stop
+    step = (stop - start) / (count - 1) if count > 1 else 0.0
+    timestamps = np.arange(row_start, row_stop, dtype=np.float64) * step + start
+    if count > 1 and row_stop == count and row_stop > row_start:
+        timestamps[-1] = stop
+    return timestamps.astype(attrs.get('timestamps_dtype', 'float64'))
+
+# --- Sensor Columns ---
+# Các cột CSV của một dataset cảm biến theo số chiều của nó: danh sách (tên cột, chỉ số cột hoặc None với dataset 1D).
+# Mỗi kênh của dataset 2D (mẫu x kênh) là một cột <tên>_Ch<i>, i đếm từ 1 (giữ nguyên tên cột mà các chương trình đọc CSV
+# đang dùng, vd. Acoustic_Signal_Ch1). Tín hiệu nhiều kênh đã được tách thành các dataset 1D <tên>_ch<k> khi trích xuất.
+# Số chiều khác không có trong bảng nên bị bỏ qua.
+SENSOR_COLUMNS_BY_NDIM = {
+    1: lambda sensor_name, shape: [(sensor_name, None)],
+    2: lambda sensor_name, shape: [(f"{sensor_name}_Ch{i+1}", i) for i in range(shape[1])],
+}
+
+# --- Helper: Read a Group in Row Blocks ---
+def iter_row_blocks(group, timestamps_dataset, sensor_matrix_dataset, csv_columns, num_rows, rows_per_block):
+    """
+    Đọc timestamps và các cột cảm biến (csv_columns: (tên cột, dataset, chỉ số cột hoặc None với dataset 1D)) theo
+    từng khối rows_per_block dòng và trả về (yield) danh sách mảng 1D của mỗi khối, timestamps trước, nên chỉ một
+    khối nằm trong bộ nhớ tại một thời điểm. Các mảng được ghi đè ở khối sau.
+    """
+    timestamps_dtype = timestamps_dataset.dtype if timestamps_dataset else np.dtype(group.attrs.get('timestamps_dtype', 'float64'))
+    column_dtypes = {timestamps_dtype} | {dataset.dtype for _, dataset, _ in csv_columns}
+    same_dtype = (len(column_dtypes) == 1 and not any('scale' in dataset.attrs for _, dataset, _ in csv_columns)
+                  and not (FLOAT32_SENSORS and timestamps_dtype == np.float64))
+    if same_dtype:
+        # Mọi cột cùng kiểu dữ liệu: một khối bộ nhớ cấp phát một lần rồi được read_direct ghi đè cho từng khối dòng.
+        # Thứ tự Fortran nên mỗi cột liên tục và pyarrow dùng luôn, không sao chép.
+        column_block = np.empty((min(rows_per_block, num_rows), 1 + len(csv_columns)), dtype=timestamps_dtype, order='F')
+        if sensor_matrix_dataset is not None:
+            row_buffer = np.empty((column_block.shape[0], len(csv_columns)), dtype=sensor_matrix_dataset.dtype)
+    else:
+        # Bộ đệm đọc cấp phát một lần cho mỗi dataset số (theo kiểu dữ liệu gốc), dùng lại cho mọi khối dòng
+        raw_buffers = {dataset.name: np.empty((min(rows_per_block, num_rows),) + dataset.shape[1:], dtype=dataset.dtype)
+                       for _, dataset, _ in csv_columns if dataset.dtype.kind in 'biuf'}
+
+    for row_start in range(0, num_rows, rows_per_block):
+        row_stop = min(row_start + rows_per_block, num_rows)
+        rows = np.s_[row_start:row_stop]
+        if same_dtype:
+            block = column_block[:row_stop - row_start]
+            if timestamps_dataset:
+                timestamps_dataset.read_direct(block[:, 0], source_sel=rows)
+            else:
+                block[:, 0] = timestamps_from_attrs(group.attrs, row_start, row_stop)
+            if sensor_matrix_dataset is not None:
+                # Đọc cả các dòng của ma trận một lần (mỗi chunk chỉ giải nén một lần) rồi chép vào các cột
+                sensor_matrix_dataset.read_direct(row_buffer[:row_stop - row_start], source_sel=rows)
+                block[:, 1:] = row_buffer[:row_stop - row_start]
+            else:
+                for j, (_, dataset, column) in enumerate(csv_columns, start=1):
+                    dataset.read_direct(block[:, j], source_sel=rows if column is None else np.s_[row_start:row_stop, column])
+            yield [block[:, j] for j in range(block.shape[1])]
+        else:
+            # Kiểu dữ liệu khác nhau hoặc cần scale: đọc các dòng của mỗi dataset một lần rồi lấy từng cột
+            columns = [timestamps_dataset[rows] if timestamps_dataset else timestamps_from_attrs(group.attrs, row_start, row_stop)]
+            dataset_blocks = {}
+            for _, dataset, column in csv_columns:
+                if dataset.name not in dataset_blocks:
+                    if dataset.name in raw_buffers:
+                        data_block = raw_buffers[dataset.name][:row_stop - row_start]
+                        dataset.read_direct(data_block, source_sel=rows)
+                    else:
+                        data_block = dataset[rows]
+                    # Kênh TDMS lưu dạng số nguyên thô (raw counts): giá trị = raw * scale + offset
+                    # (với sensor_matrix, scale/offset là mảng theo từng cột)
+                    if 'scale' in dataset.attrs:
+                        data_block = data_block.astype(np.float32) * dataset.attrs['scale'] + dataset.attrs.get('offset', 0.0)
+                    if FLOAT32_SENSORS and data_block.dtype == np.float64:
+                        data_block = data_block.astype(np.float32)
+                    dataset_blocks[dataset.name] = data_block
+                data_block = dataset_blocks[dataset.name]
+                columns.append(data_block if column is None else data_block[:, column])
+            yield columns
+
+# --- Helper: Free Memory ---
+def available_memory_bytes():
+    """RAM còn trống (byte), hoặc None nếu không xác định được (không có psutil và không phải hệ POSIX)."""
+    if _PSUTIL_AVAILABLE:
+        return psutil.virtual_memory().available
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+# --- Helper: Groups to Load in Memory ---
+def in_memory_groups(f, group_names, num_workers):
+    """
+    Tập tên các group (của tệp HDF5 f đã mở) được nạp vào RAM khi chạy với --in-memory: group là external link tới tệp
+    *_parts riêng, và tệp đó không lớn hơn phần RAM còn trống dành cho mỗi tiến trình.
+    """
+    available_bytes = available_memory_bytes()
+    if available_bytes is None:
+        return set()
+    budget_bytes = available_bytes * IN_MEMORY_RAM_FRACTION / num_workers
+    groups = set()
+    for group_name in group_names:
+        link = f.get(group_name, getlink=True)
+        if isinstance(link, h5py.ExternalLink):
+            # Đường dẫn trong link là tương đối so với thư mục của tệp chính
+            part_path = os.path.join(os.path.dirname(HDF5_FILE_PATH), link.filename)
+            if os.path.isfile(part_path) and os.path.getsize(part_path) <= budget_bytes:
+                groups.add(group_name)
+    return groups
+
+# --- Worker Function: Convert a Single Group ---
+# Chạy trong một tiến trình con của pool bên dưới; phải là hàm cấp cao nhất để pickle được.
+def convert_group(job):
+    """
+    job là (group_name, in_memory). Chuyển Group cấp cao nhất group_name của HDF5_FILE_PATH (mỗi Group là một tệp gốc)
+    thành một tệp CSV. Mỗi lần gọi tự mở tệp HDF5 ở chế độ chỉ đọc; với in_memory, tệp được nạp cả vào RAM
+    (driver 'core', áp dụng cả cho tệp *_parts mở qua external link). Mọi thứ in ra được gom lại và trả về cùng kết quả,
+    để tiến trình chính in kết quả của từng group liền một khối, theo đúng thứ tự các group.
+    Trả về (trạng thái: 'processed', 'skipped' hoặc 'error', nội dung in ra).
+    """
+    group_name, in_memory = job
+    file_options = dict(HDF5_READ_CACHE, driver='core', backing_store=False) if in_memory else HDF5_READ_CACHE
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            with h5py.File(HDF5_FILE_PATH, 'r', **file_options) as f:
+                status = _convert_group(f, group_name)
+        except Exception as e:
+            print(f"\nAn error occurred while converting group {group_name}: {e}")
+            status = 'error'
+    return status, output.getvalue()
+
+def _convert_group(f, group_name):
+    """Phần thân của convert_group với tệp HDF5 f đã mở; trả về trạng thái."""
+    group = f[group_name]
+    relative_filepath = group.attrs.get('relative_filepath_str', group_name)
+
+    print(f"\nProcessing HDF5 Group: {group_name} (Original: {relative_filepath})")
+
+    # Group chỉ có metadata (extraction.py ghi has_sensor_data=False): bỏ qua ngay, không cần tra 'sensor_values'.
+    # Tệp HDF5 cũ không có thuộc tính này thì kiểm tra như bình thường bên dưới.
+    if not group.attrs.get('has_sensor_data', True):
+        print(f"  Skipping {relative_filepath} (Group: {group_name}): No sensor_values found.")
+        return 'skipped'
 
-                        # Chuẩn bị dữ liệu cho DataFrame
-                        data_for_df = {'Timestamp': timestamps_array}
-
-                        # Thêm dữ liệu cảm biến vào DataFrame
-                        for sensor_name, dataset in sensor_datasets.items():
-                            sensor_data_array = dataset[:]
-                            if sensor_data_array.ndim == 1:
-                                data_for_df[sensor_name] = sensor_data_array
-                            elif sensor_data_array.ndim == 2:
-                                for i in range(sensor_data_array.shape[1]):
-                                    data_for_df[f"{sensor_name}_Ch{i+1}"] = sensor_data_array[:, i]
-
-                        # Tạo DataFrame
-                        df = pd.DataFrame(data_for_df)
-
-                        # Xác định thư mục lưu trữ theo loại cảm biến
-                        if 'vibration' in group_name.lower():
-                            csv_filepath = os.path.join(OUTPUT_VIBRATION_CSV_DIR, f"{group_name}.csv")
-                        elif 'acoustic' in group_name.lower():
-                            csv_filepath = os.path.join(OUTPUT_ACOUSTIC_CSV_DIR, f"{group_name}.csv")
-                        else:
-                            print(f"  Warning: Group {group_name} does not match vibration or acoustic. Skipping.")
-                            skipped_no_data_count += 1
+    # Kiểm tra xem Group này có chứa Dataset dữ liệu cảm biến không (MAT files with data). Mỗi tên chỉ được tra một lần
+    # bằng get() (None nếu không có) thay vì 'in' rồi mới mở
+    sensor_values_group = group.get('sensor_values')
+    if isinstance(sensor_values_group, h5py.Group):
+
+        # Kiểm tra xem trong Group sensor_values có Dataset nào không. Các con được liệt kê bằng API cấp thấp
+        # h5o.visit(info=True): loại đối tượng có sẵn trong ObjInfo, nên chỉ các dataset được mở (mỗi cái một lần)
+        # để kiểm tra kích thước; thứ tự theo tên như keys()
+        dataset_names = []
+        def collect_dataset(name, info):
+            if info.type == h5py.h5o.TYPE_DATASET and b'/' not in name:
+                dataset_names.append(name.decode('utf-8'))
+        h5py.h5o.visit(sensor_values_group.id, collect_dataset, info=True)
+        sensor_datasets = {}
+        for name in dataset_names:
+            dataset = sensor_values_group[name]
+            if dataset.size > 0:
+                sensor_datasets[name] = dataset
+
+        # Kiểm tra Dataset timestamps (timestamps đều nhau chỉ được lưu dưới dạng thuộc tính, xem timestamps_from_attrs)
+        has_timestamps_attrs = group.attrs.get('timestamps_count', 0) > 0
+        timestamps_dataset = group.get('timestamps')
+        if not (isinstance(timestamps_dataset, h5py.Dataset) and timestamps_dataset.size > 0):
+            timestamps_dataset = None
+
+        if sensor_datasets and (timestamps_dataset or has_timestamps_attrs):
+            try:
+                # Các cột cảm biến của CSV: (tên cột, dataset, chỉ số cột hoặc None với dataset 1D). Các cảm biến cùng độ dài
+                # được lưu chung trong một ma trận 2D 'sensor_matrix' (mẫu x cảm biến), cột i là cảm biến sensor_names[i]
+                sensor_matrix_dataset = sensor_datasets.get('sensor_matrix')
+                if sensor_matrix_dataset is not None:
+                    csv_columns = [(sensor_name, sensor_matrix_dataset, i)
+                                   for i, sensor_name in enumerate(sensor_values_group['sensor_names'].asstr()[:])]
+                else:
+                    csv_columns = []
+                    for sensor_name, dataset in sensor_datasets.items():
+                        sensor_columns = SENSOR_COLUMNS_BY_NDIM.get(dataset.ndim)
+                        if sensor_columns is None:
+                            print(f"  Warning: Sensor {sensor_name} has shape {dataset.shape} (only 1D and 2D are supported). Skipping this sensor.")
                             continue
+                        csv_columns.extend((column_name, dataset, column) for column_name, column in sensor_columns(sensor_name, dataset.shape))
 
-                        # Lưu DataFrame vào tệp CSV
-                        df.to_csv(csv_filepath, index=False)
+                # Kiểm tra số lượng mẫu khớp nhau giữa timestamps và sensor data
+                num_rows = timestamps_dataset.shape[0] if timestamps_dataset else int(group.attrs['timestamps_count'])
+                first_sensor_dataset = csv_columns[0][1] if csv_columns else next(iter(sensor_datasets.values()))
+                if num_rows != first_sensor_dataset.shape[0]:
+                    print(f"  Warning: Timestamps length ({num_rows}) does not match sensor data length.")
+                    return 'skipped'
 
-                        print(f"  Successfully saved to {csv_filepath} (Shape: {df.shape}).")
-                        processed_count += 1
+                # Xác định thư mục lưu trữ theo loại cảm biến
+                if 'vibration' in group_name.lower():
+                    output_directory = OUTPUT_VIBRATION_CSV_DIR
+                elif 'acoustic' in group_name.lower():
+                    output_directory = OUTPUT_ACOUSTIC_CSV_DIR
+                else:
+                    print(f"  Warning: Group {group_name} does not match vibration or acoustic. Skipping.")
+                    return 'skipped'
 
-                    except Exception as e:
-                        print(f"  Error converting or saving CSV for {relative_filepath} (Group: {group_name}): {e}")
-                        error_count += 1
+                # Đọc và ghi theo từng khối dòng, khớp với chunk lớn nhất trong các dataset được đọc (thường mọi dataset có
+                # cùng số dòng mỗi chunk, nên mỗi chunk chỉ đọc một lần; chunk nhỏ hơn nằm vắt qua hai khối vẫn còn trong
+                # bộ nhớ đệm chunk HDF5_READ_CACHE). Dataset không chia chunk (contiguous) đọc được theo dòng bất kỳ.
+                chunk_rows = max((dataset.chunks[0] for dataset in [timestamps_dataset] + [dataset for _, dataset, _ in csv_columns]
+                                  if dataset is not None and dataset.chunks), default=ROWS_PER_BLOCK)
+                rows_per_block = chunk_rows * max(1, ROWS_PER_BLOCK // chunk_rows)
+                column_names = ['Timestamp'] + [column_name for column_name, _, _ in csv_columns]
 
+                # Lưu dữ liệu vào tệp CSV và/hoặc Parquet (cả hai được ghi từ cùng một lần đọc các khối dòng)
+                row_blocks = iter_row_blocks(group, timestamps_dataset, sensor_matrix_dataset, csv_columns, num_rows, rows_per_block)
+                output_filepaths = []
+                if WRITE_PARQUET:
+                    parquet_filepath = os.path.join(output_directory, f"{group_name}.parquet")
+                    row_blocks = write_parquet_blocks(column_names, row_blocks, parquet_filepath)
+                    output_filepaths.append(parquet_filepath)
+                if WRITE_CSV:
+                    csv_filepath = os.path.join(output_directory, f"{group_name}{CSV_EXTENSION}")
+                    csv_shape = write_csv(column_names, row_blocks, csv_filepath)
+                    output_filepaths.insert(0, csv_filepath)
                 else:
-                    print(f"  Skipping {relative_filepath} (Group: {group_name}): No valid sensor data or timestamps.")
-                    skipped_no_data_count += 1
+                    csv_shape = (sum(len(columns[0]) for columns in row_blocks), len(column_names))
 
-            else:
-                print(f"  Skipping {relative_filepath} (Group: {group_name}): No sensor_values found.")
-                skipped_no_data_count += 1
-
-except FileNotFoundError:
-    print(f"\nError: HDF5 file not found at {HDF5_FILE_PATH}. Please run the extraction script first.")
-except Exception as e:
-    print(f"\nAn error occurred during HDF5 to CSV conversion: {e}")
-
-print(f"\n--- CSV Conversion Summary ---")
-print(f"Successfully converted: {processed_count}")
-print(f"Skipped (no data or no valid timestamps): {skipped_no_data_count}")
-print(f"Errors during conversion: {error_count}")
+                print(f"  Successfully saved to {' and '.join(output_filepaths)} (Shape: {csv_shape}).")
+                return 'processed'
+
+            except Exception as e:
+                print(f"  Error converting or saving CSV for {relative_filepath} (Group: {group_name}): {e}")
+                return 'error'
+
+        else:
+            print(f"  Skipping {relative_filepath} (Group: {group_name}): No valid sensor data or timestamps.")
+            return 'skipped'
+
+    else:
+        print(f"  Skipping {relative_filepath} (Group: {group_name}): No sensor_values found.")
+        return 'skipped'
+
+# --- Conversion Script ---
+# Chỉ chạy khi thực thi trực tiếp, để các tiến trình con import module này (ví dụ với 'spawn') không chạy lại.
+if __name__ == '__main__':
+    if OUTPUT_FORMAT not in OUTPUT_FORMATS:
+        print(f"Error: Unknown output format '{OUTPUT_FORMAT}' (choose one of: {', '.join(OUTPUT_FORMATS)}).")
+        sys.exit(2)
+    if OUTPUT_FORMAT != 'csv' and not WRITE_PARQUET:
+        print("Warning: pyarrow (with Parquet support) is not installed; writing CSV files only.")
+
+    print(f"Attempting to convert data from HDF5 file: {HDF5_FILE_PATH}")
+    print(f"Output CSV files for vibration will be saved in: {OUTPUT_VIBRATION_CSV_DIR}")
+    print(f"Output CSV files for acoustic will be saved in: {OUTPUT_ACOUSTIC_CSV_DIR}")
+
+    # Tạo thư mục nếu chưa có
+    if not os.path.exists(OUTPUT_VIBRATION_CSV_DIR):
+        os.makedirs(OUTPUT_VIBRATION_CSV_DIR)
+        print(f"Created output directory for vibration: {OUTPUT_VIBRATION_CSV_DIR}")
+
+    if not os.path.exists(OUTPUT_ACOUSTIC_CSV_DIR):
+        os.makedirs(OUTPUT_ACOUSTIC_CSV_DIR)
+        print(f"Created output directory for acoustic: {OUTPUT_ACOUSTIC_CSV_DIR}")
+
+    status_counts = {'processed': 0, 'skipped': 0, 'error': 0}
+
+    try:
+        # Lấy danh sách các Group ở cấp cao nhất một lần; mỗi group được chuyển độc lập trong một tiến trình con
+        num_workers = os.cpu_count() or 1
+        with h5py.File(HDF5_FILE_PATH, 'r') as f:
+            group_names = list(f.keys())
+            memory_groups = in_memory_groups(f, group_names, num_workers) if LOAD_IN_MEMORY else set()
+        if LOAD_IN_MEMORY:
+            print(f"Loading {len(memory_groups)} of {len(group_names)} groups into memory before reading them.")
+
+        # imap giữ nguyên thứ tự các group, nên nội dung in ra giống như khi chạy tuần tự
+        jobs = [(group_name, group_name in memory_groups) for group_name in group_names]
+        with multiprocessing.Pool(processes=max(1, min(num_workers, len(group_names)))) as pool:
+            for status, output in pool.imap(convert_group, jobs):
+                # Nội dung in ra của cả group (đã gom trong tiến trình con) đi ra bằng một lần ghi duy nhất, nên không cần
+                # thêm bộ đệm hay logging: ghi vào tệp/CI thì stdout đã có bộ đệm khối, ghi ra terminal thì một lần ghi mỗi group
+                print(output, end='')
+                status_counts[status] += 1
+
+    except FileNotFoundError:
+        print(f"\nError: HDF5 file not found at {HDF5_FILE_PATH}. Please run the extraction script first.")
+    except Exception as e:
+        print(f"\nAn error occurred during HDF5 to CSV conversion: {e}")
+
+    print(f"\n--- CSV Conversion Summary ---")
+    print(f"Successfully converted: {status_counts['processed']}")
+    print(f"Skipped (no data or no valid timestamps): {status_counts['skipped']}")
+    print(f"Errors during conversion: {status_counts['error']}")
@@ -1,12 +1,42 @@
 import h5py
+from collections import defaultdict
+from functools import partial
+
+# Lớp h5py tương ứng với từng loại đối tượng HDF5 (in ra giống type(obj) của visititems)
+OBJECT_CLASSES = {h5py.h5o.TYPE_GROUP: h5py.Group, h5py.h5o.TYPE_DATASET: h5py.Dataset, h5py.h5o.TYPE_NAMED_DATATYPE: h5py.Datatype}
 
 # Mở file H5
 with h5py.File('extracted_dataset_structured.h5', 'r') as file:
-    # In ra tên tất cả các nhóm (groups) và dataset trong file
-    def print_structure(name, obj):
-        print(f"Name: {name}, Type: {type(obj)}")
-        if isinstance(obj, h5py.Group):
-            print(f"Group contains: {list(obj.keys())}")
-    
-    # Duyệt qua cấu trúc file
-    file.visititems(print_structure)
+    # In ra tên tất cả các nhóm (groups) và dataset trong file.
+    # Duyệt bằng API cấp thấp h5o.visit(info=True): loại đối tượng có sẵn trong ObjInfo nên không phải mở từng đối tượng
+    # thành Group/Dataset như visititems; danh sách con của mỗi group được suy ra từ chính các tên đã duyệt
+    # (cùng thứ tự theo tên như keys()), và tất cả được in một lần sau khi duyệt xong.
+    structure = [] # (tên đầy đủ, lớp h5py)
+    group_children = defaultdict(list)
+
+    def collect_object(group_name, name, info):
+        # group_name: group cấp cao nhất đang duyệt (gắn bằng partial); name: tên tương đối trong group đó
+        name = name.decode('utf-8')
+        if name == '.':
+            return None
+        full_name = f"{group_name}/{name}"
+        structure.append((full_name, OBJECT_CLASSES.get(info.type)))
+        parent_name, _, child_name = full_name.rpartition('/')
+        group_children[parent_name].append(child_name)
+        return None
+
+    # Các group ở cấp cao nhất có thể là external link tới file trong thư mục *_parts (visit không đi theo link),
+    # nên duyệt từng group một
+    for group_name in file:
+        group_object = file[group_name]
+        structure.append((group_name, type(group_object)))
+        if isinstance(group_object, h5py.Group):
+            group_children[group_name] # Group rỗng vẫn in "Group contains: []"
+            h5py.h5o.visit(group_object.id, partial(collect_object, group_name), info=True)
+
+    lines = []
+    for name, object_class in structure:
+        lines.append(f"Name: {name}, Type: {object_class}")
+        if object_class is h5py.Group:
+            lines.append(f"Group contains: {group_children[name]}")
+    print('\n'.join(lines))